@@ -0,0 +1,263 @@
+"""
+API 效能測試
+=====================================
+以 synthetic_data.py 產生指定規模的資料，在同一個行程內透過 httpx 直接呼叫 FastAPI 應用程式
+（不經過網路），量測各情境的吞吐量與 p50/p95/p99 延遲，結果以 JSON 輸出。
+
+使用方式：
+    python benchmark.py --members 5000 --events 200 --records 200000 --output result.json
+    python benchmark.py ... --compare baseline.json   # 與之前的結果比較，有退步時結束代碼為 1
+
+資料與設定檔寫在暫存目錄，不會動到 data/ 內的資料；其他設定（PERSIST_MODE、STORAGE_BACKEND 等）
+沿用環境變數。
+"""
+
+from datetime import datetime
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import httpx
+
+import synthetic_data
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """最近排名法計算百分位數"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: list, errors: int, wall_seconds: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / wall_seconds, 1) if wall_seconds else None,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else None,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else None,
+    }
+
+
+async def run_scenario(requests: list, concurrency: int) -> dict:
+    """以固定並行數執行一組請求，requests 為回傳 httpx.Response 的協程函數列表"""
+    latencies = []
+    errors = 0
+    queue = list(reversed(requests))
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            send = queue.pop()
+            start = time.perf_counter()
+            response = await send()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def measure_sync(func, count: int) -> dict:
+    """量測同步函數（如 save_db）的執行時間"""
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(count):
+        t = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, 0, time.perf_counter() - start)
+
+
+async def run_benchmark(main, requests: int, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=main.app)
+    results = {}
+    await main.on_startup()
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            login = await client.post("/api/auth/login", json={
+                "username": main.ADMIN_USERNAME, "password": main.ADMIN_PASSWORD
+            })
+            headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+            member_ids = list(main.db["members"])
+            event_ids = list(main.db["events"])
+
+            async def new_event(name: str) -> str:
+                response = await client.post("/api/events", headers=headers, json={
+                    "name": name, "points": 1, "date": datetime.now().date().isoformat()
+                })
+                return response.json()["id"]
+
+            def get(url: str, **kwargs):
+                return lambda: client.get(url, headers=headers, **kwargs)
+
+            # 單人簽到：每個新事件最多簽到全部人員一次
+            sends = []
+            event_id = None
+            for i in range(requests):
+                if i % len(member_ids) == 0:
+                    event_id = await new_event(f"benchmark checkin {i}")
+                body = {"event_id": event_id, "member_ids": [member_ids[i % len(member_ids)]]}
+                sends.append(lambda body=body: client.post("/api/checkin", headers=headers, json=body))
+            results["checkin"] = await run_scenario(sends, concurrency)
+
+            # 批量簽到：每次 50 人
+            batch_size = min(50, len(member_ids))
+            per_event = max(1, len(member_ids) // batch_size)
+            sends = []
+            batches = max(1, requests // 10)
+            for i in range(batches):
+                if i % per_event == 0:
+                    event_id = await new_event(f"benchmark batch {i}")
+                start = (i % per_event) * batch_size
+                body = {"event_id": event_id, "member_ids": member_ids[start:start + batch_size]}
+                sends.append(lambda body=body: client.post("/api/checkin/batch", headers=headers, json=body))
+            results["checkin_batch"] = await run_scenario(sends, concurrency)
+
+            # 等待寫入磁碟的簽到（含持久化成本）
+            event_id = await new_event("benchmark durable")
+            durable_headers = {**headers, "X-Wait-Durable": "1"}
+            count = min(max(1, requests // 10), len(member_ids))
+            sends = [
+                lambda body={"event_id": event_id, "member_ids": [member_ids[i]]}:
+                    client.post("/api/checkin", headers=durable_headers, json=body)
+                for i in range(count)
+            ]
+            results["checkin_durable"] = await run_scenario(sends, concurrency)
+
+            # 讀取情境（資料未異動時會命中已編碼回應的快取）
+            read_scenarios = {
+                "leaderboard": get("/api/leaderboard", params={"limit": 50}),
+                "leaderboard_team": get("/api/leaderboard", params={
+                    "team_id": next(iter(main.db["teams"]), ""), "limit": 50
+                }),
+                "public_leaderboard": lambda: client.get("/api/public/leaderboard", params={"limit": 100}),
+                "member_rank": get(f"/api/leaderboard/rank/{member_ids[len(member_ids) // 2]}"),
+                "statistics": get("/api/statistics"),
+                "members": get("/api/members"),
+                "checkin_records_page": get("/api/checkin-records", params={"limit": 100}),
+                "checkin_records_event": get("/api/checkin-records", params={
+                    "event_id": event_ids[len(event_ids) // 2] if event_ids else "", "limit": 100
+                }),
+            }
+            for name, send in read_scenarios.items():
+                results[name] = await run_scenario([send] * requests, concurrency)
+
+            # 交錯寫入與讀取，快取每次都會失效
+            sends = []
+            event_id = await new_event("benchmark mixed")
+            for i in range(min(requests, len(member_ids))):
+                body = {"event_id": event_id, "member_ids": [member_ids[i]]}
+                sends.append(lambda body=body: client.post("/api/checkin", headers=headers, json=body))
+                sends.append(get("/api/leaderboard", params={"limit": 50}))
+            results["mixed_checkin_leaderboard"] = await run_scenario(sends, concurrency)
+    finally:
+        await main.on_shutdown()
+
+    # 持久化成本：每次只異動一筆資料時寫入磁碟所需的時間
+    member = main.db["members"][member_ids[0]]
+
+    def save_one():
+        main.put_doc("members", member)
+        main.save_db()
+
+    results["save_db"] = measure_sync(save_one, max(1, min(requests // 10, 50)))
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """比較兩次結果，回傳退步的項目（p95 延遲變慢或吞吐量下降超過 threshold）"""
+    regressions = []
+    print(f"{'情境':<28}{'p95 (ms)':>22}{'吞吐量 (req/s)':>26}")
+    for name, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        p95_change = (result["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0
+        rps_change = (
+            (result["throughput_rps"] - base["throughput_rps"]) / base["throughput_rps"]
+            if base.get("throughput_rps") else 0
+        )
+        flag = ""
+        if p95_change > threshold or rps_change < -threshold:
+            regressions.append({"scenario": name, "p95_change": round(p95_change, 3), "throughput_change": round(rps_change, 3)})
+            flag = "  <- 退步"
+        print(f"{name:<28}{base['p95_ms']:>9.2f} → {result['p95_ms']:>8.2f}"
+              f"{base['throughput_rps'] or 0:>12.1f} → {result['throughput_rps'] or 0:>9.1f}{flag}")
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="API 效能測試")
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=500, help="每個情境的請求數")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--output", help="結果輸出路徑（預設輸出到畫面）")
+    parser.add_argument("--compare", help="與之前的結果檔比較")
+    parser.add_argument("--threshold", type=float, default=0.2, help="視為退步的變化比例")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # main 在匯入時就會載入資料，必須先產生資料並設定好路徑
+        data_file = os.path.join(directory, "db.json")
+        synthetic_data.write(synthetic_data.generate(args.members, args.events, args.records, seed=args.seed), data_file)
+        os.environ["DATA_FILE"] = data_file
+        os.environ["SQLITE_FILE"] = os.path.join(directory, "db.sqlite3")
+        if os.getenv("STORAGE_BACKEND") == "sqlite":
+            from sqlite_store import import_data
+            import_data(json.load(open(data_file, encoding="utf-8")), os.environ["SQLITE_FILE"])
+
+        start = time.perf_counter()
+        import main
+        startup_seconds = time.perf_counter() - start
+
+        scenarios = asyncio.run(run_benchmark(main, args.requests, args.concurrency))
+
+    result = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "data": {"members": args.members, "events": args.events, "records": args.records, "seed": args.seed},
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "config": {
+                "storage_backend": main.STORAGE_BACKEND,
+                "persist_mode": main.PERSIST_MODE,
+                "snapshot_format": main.SNAPSHOT_FORMAT,
+                "flush_interval_ms": main.FLUSH_INTERVAL_MS,
+            },
+            "startup_seconds": round(startup_seconds, 3),
+        },
+        "scenarios": scenarios,
+    }
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(result, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
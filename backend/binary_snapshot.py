@@ -0,0 +1,155 @@
+"""
+二進位快照格式
+=====================================
+db.json 的精簡替代格式，檔案較小、解析比縮排的 JSON 快；啟動時重建記憶體索引的時間不受格式影響。
+
+檔案結構（整數皆為 big-endian）：
+- 檔頭：MAGIC（8 bytes）、格式版本（uint16）、集合數（uint32）
+- 每個集合：名稱長度（uint16）、名稱（UTF-8）、筆數（uint32）、內容長度（uint64）、內容
+- 內容為該集合 {id: doc} 的精簡 JSON（有 orjson 時以 orjson 編碼與解析）
+
+載入時先依檔頭檢查格式版本，版本不符時拒絕載入，不會誤讀。
+"""
+
+import json
+import os
+import struct
+import time
+
+try:
+    import orjson
+except ImportError:  # 未安裝時改用標準 json
+    orjson = None
+
+MAGIC = b"SIGNSNAP"
+VERSION = 1
+
+HEADER = struct.Struct(">8sHI")
+SECTION_NAME = struct.Struct(">H")
+SECTION_BODY = struct.Struct(">IQ")
+
+
+def encode(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, default=str, separators=(",", ":")).encode()
+
+
+def decode(raw: bytes):
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(bytes(raw))
+
+
+def is_binary_snapshot(path: str) -> bool:
+    """檢查檔案開頭是否為二進位快照"""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def dumps(data: dict) -> bytes:
+    """將整份資料編碼為二進位快照"""
+    parts = [HEADER.pack(MAGIC, VERSION, len(data))]
+    for name, docs in data.items():
+        name_bytes = name.encode()
+        body = encode(docs)
+        parts.append(SECTION_NAME.pack(len(name_bytes)))
+        parts.append(name_bytes)
+        parts.append(SECTION_BODY.pack(len(docs), len(body)))
+        parts.append(body)
+    return b"".join(parts)
+
+
+def loads(raw: bytes) -> dict:
+    """解析二進位快照"""
+    if len(raw) < HEADER.size:
+        raise ValueError("快照檔案不完整")
+    magic, version, count = HEADER.unpack_from(raw, 0)
+    if magic != MAGIC:
+        raise ValueError("不是二進位快照檔案")
+    if version != VERSION:
+        raise ValueError(f"不支援的快照版本: {version}")
+    view = memoryview(raw)
+    offset = HEADER.size
+    data = {}
+    for _ in range(count):
+        (name_len,) = SECTION_NAME.unpack_from(raw, offset)
+        offset += SECTION_NAME.size
+        name = bytes(view[offset:offset + name_len]).decode()
+        offset += name_len
+        doc_count, body_len = SECTION_BODY.unpack_from(raw, offset)
+        offset += SECTION_BODY.size
+        if offset + body_len > len(raw):
+            raise ValueError("快照檔案不完整")
+        docs = decode(view[offset:offset + body_len])
+        offset += body_len
+        if len(docs) != doc_count:
+            raise ValueError(f"{name} 筆數不符")
+        data[name] = docs
+    return data
+
+
+def write(data: dict, path: str) -> int:
+    """寫入二進位快照（先寫暫存檔再改名，避免寫到一半損毀），回傳寫入的位元組數"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    raw = dumps(data)
+    tmp_file = path + ".tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+    return len(raw)
+
+
+def read(path: str) -> dict:
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def benchmark(data: dict, directory: str, repeat: int = 5, prepare=None) -> dict:
+    """比較 JSON（目前 db.json 的縮排格式）與二進位快照的檔案大小與載入時間
+
+    prepare 為載入後的處理（例如重建索引），有指定時另外回報含此步驟的啟動時間。
+    """
+    os.makedirs(directory, exist_ok=True)
+    json_path = os.path.join(directory, "bench.json")
+    binary_path = os.path.join(directory, "bench.bin")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    write(data, binary_path)
+
+    def load_json():
+        with open(json_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def measure(load):
+        load_times = []
+        startup_times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            loaded = load()
+            load_times.append(time.perf_counter() - start)
+            if prepare is not None:
+                prepare(loaded)
+                startup_times.append(time.perf_counter() - start)
+        result = {"load_seconds": round(min(load_times), 4)}
+        if startup_times:
+            result["startup_seconds"] = round(min(startup_times), 4)
+        return result
+
+    result = {
+        "records": {name: len(docs) for name, docs in data.items()},
+        "json": {"bytes": os.path.getsize(json_path), **measure(load_json)},
+        "binary": {"bytes": os.path.getsize(binary_path), **measure(lambda: read(binary_path))},
+        "encoder": "orjson" if orjson is not None else "json",
+    }
+    result["speedup"] = round(result["json"]["load_seconds"] / result["binary"]["load_seconds"], 2)
+    if prepare is not None:
+        # 含重建索引的整體啟動時間，格式只影響其中的解析部分
+        result["startup_speedup"] = round(result["json"]["startup_seconds"] / result["binary"]["startup_seconds"], 2)
+    os.remove(json_path)
+    os.remove(binary_path)
+    return result
@@ -10,18 +10,47 @@
 - 批量簽到
 """
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse, JSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, ValidationError
 from typing import Optional, List
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 from enum import Enum
+from contextvars import ContextVar
+from contextlib import asynccontextmanager, nullcontext
+import asyncio
+from sortedcontainers import SortedList
 import jwt
 import hashlib
 import uuid
+import itertools
+import bisect
+import heapq
 import os
 import json
+import base64
+import gc
+import codecs
+import csv
+import io
+import time
+import random
+import functools
+import cProfile
+import marshal
+import pstats
+import re
+import unicodedata
+from collections import deque, OrderedDict
+from record_store import CheckinRecordStore
+
+try:
+    import orjson
+except ImportError:  # 未安裝時改用標準 json
+    orjson = None
 
 # ============== 配置（從環境變數讀取）==============
 SECRET_KEY = os.getenv("SECRET_KEY", "change-me-in-production")
@@ -29,11 +58,66 @@ ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin123")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 小時
+STREAM_CHUNK_SIZE = 500  # NDJSON 串流每次輸出的筆數
+PUBLIC_PAGE_SIZE = 100  # 公開排行榜每頁預設的簽到記錄筆數
+PUBLIC_PAGE_MAX = 1000  # 公開排行榜每頁最多的簽到記錄筆數
+IMPORT_MAX_ERRORS = 100  # 批量匯入時最多回報的錯誤列數
+SYNC_MAX_OPS = int(os.getenv("SYNC_MAX_OPS", "10000"))  # 離線同步單次最多的簽到筆數
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))  # 已驗證 Token 的快取筆數（0 為停用）
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))  # 已編碼回應快取的總大小上限
+SSE_HISTORY = int(os.getenv("SSE_HISTORY", "1000"))  # 保留最近幾則推送訊息供斷線重連補發
+SSE_QUEUE_SIZE = 1000  # 每個連線最多累積的未送出訊息
+SSE_KEEPALIVE_SECONDS = 15
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")  # 啟用效能剖析與各階段計時
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # 啟用時隨機剖析的請求比例（0~1）
+PROFILE_HISTORY = int(os.getenv("PROFILE_HISTORY", "20"))  # 保留最近幾份剖析結果
+
+# 每次啟動不同，避免重啟後版本號、訊息編號重新計算而與舊的混淆
+BOOT_ID = uuid.uuid4().hex[:8]
+DATA_FILE = os.getenv("DATA_FILE", "/app/data/db.json")
+PERSIST_MODE = os.getenv("PERSIST_MODE", "snapshot")  # snapshot 或 journal
+SNAPSHOT_FORMAT = os.getenv("SNAPSHOT_FORMAT", "json")  # json（db.json）或 binary（db.bin）
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")  # json 或 sqlite
+RECORD_STORE = os.getenv("RECORD_STORE", "columnar")  # json 儲存引擎的簽到記錄：columnar（欄位式，見 record_store.py）或 dict
+SQLITE_FILE = os.getenv("SQLITE_FILE", "/app/data/db.sqlite3")
+JOURNAL_COMPACT_EVERY = int(os.getenv("JOURNAL_COMPACT_EVERY", "1000"))  # 每幾次提交壓縮一次日誌
+FLUSH_INTERVAL_MS = int(os.getenv("FLUSH_INTERVAL_MS", "200"))  # 背景寫入間隔，0 表示每次請求同步寫入
+FLUSH_MAX_PENDING = int(os.getenv("FLUSH_MAX_PENDING", "500"))  # 待寫入異動達此數量時立即寫入
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))  # 工作行程數（與 uvicorn --workers 相同的環境變數）
+SYNC_INTERVAL_SECONDS = 0.5  # 多工作行程時，閒置行程檢查其他行程異動的間隔
+SHARED_LOCK_JOIN_SECONDS = 0.05  # 多工作行程時，同一行程的寫入請求在取得寫入鎖後多久內可直接加入
+CHECKIN_QUEUE_SIZE = int(os.getenv("CHECKIN_QUEUE_SIZE", "1000"))  # 單人簽到佇列最多等待處理的請求數（0 為停用，每個請求各自處理）
+CHECKIN_BATCH_WINDOW_MS = int(os.getenv("CHECKIN_BATCH_WINDOW_MS", "5"))  # 同步寫入時，收到簽到後等待多久再處理，讓同時送達的請求合併成一批
+CHECKIN_RETRY_AFTER_SECONDS = 1  # 佇列已滿時回應 429 的 Retry-After
+
+if WORKERS > 1 and STORAGE_BACKEND != "sqlite":
+    raise RuntimeError("多個工作行程需共用 SQLite 資料庫，請設定 STORAGE_BACKEND=sqlite")
+
+def encode_json(content) -> bytes:
+    """編碼 JSON（有 orjson 時使用 orjson）"""
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, default=str, separators=(",", ":")).encode()
+
+class FastJSONResponse(JSONResponse):
+    """以 encode_json() 輸出的 JSON 回應"""
+
+    def render(self, content) -> bytes:
+        return encode_json(content)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """啟動時開始背景工作，關閉時寫入剩下的資料"""
+    await on_startup()
+    yield
+    await on_shutdown()
 
 app = FastAPI(
     title="簽到積分系統 API",
     description="一個完整的簽到積分管理系統",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # CORS 設定
@@ -45,7 +129,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-security = HTTPBearer()
+security = HTTPBearer(auto_error=False)  # 未帶 Token 時由 verify_token 回應，以便計入認證失敗
 
 # ============== 資料模型 ==============
 
@@ -65,12 +149,14 @@ class LoginRequest(BaseModel):
 
 class MemberCreate(BaseModel):
     name: str
-    team: Optional[str] = None
+    team: Optional[str] = None  # 團隊名稱，或改用 team_id
+    team_id: Optional[str] = None
     email: Optional[str] = None
 
 class MemberUpdate(BaseModel):
     name: Optional[str] = None
     team: Optional[str] = None
+    team_id: Optional[str] = None
     email: Optional[str] = None
 
 class TeamCreate(BaseModel):
@@ -100,6 +186,15 @@ class BatchCheckInRequest(BaseModel):
     event_id: str
     member_ids: List[str]
 
+class SyncCheckIn(BaseModel):
+    op_id: str  # 報到機產生的操作編號（建議使用 UUID），重送時沿用
+    event_id: str
+    member_id: str
+    checked_in_at: Optional[datetime] = None  # 報到機記錄的簽到時間
+
+class CheckInSyncRequest(BaseModel):
+    checkins: List[SyncCheckIn]
+
 # 回應模型
 class Token(BaseModel):
     access_token: str
@@ -109,7 +204,8 @@ class Token(BaseModel):
 class Member(BaseModel):
     id: str
     name: str
-    team: str
+    team_id: Optional[str]
+    team: Optional[str]  # 由 team_id 解析的團隊名稱
     points: float
     email: Optional[str]
     created_at: str
@@ -136,53 +232,1677 @@ class CheckInRecord(BaseModel):
     points_awarded: float
     checked_in_at: str
 
-# ============== 資料持久化 ==============
-DATA_FILE = "/app/data/db.json"
+# ============== 記憶體索引 ==============
+# 索引隨 put_doc / delete_doc / clear_collection 自動維護，載入時整批重建
+# 每個索引提供 add(doc)、remove(doc)（傳入被刪除的資料）、clear()、build(docs)、empty_copy()、diff(expected)
+_MISSING = object()
+
+class SecondaryIndex:
+    """一對多索引：key -> 資料 id（依加入順序）；key_func 回傳 _MISSING 的資料不列入索引"""
+
+    def __init__(self, collection: str, key_func):
+        self.collection = collection
+        self.key_func = key_func
+        self.buckets = {}   # key -> {doc_id: None}
+        self.doc_keys = {}  # doc_id -> 目前所在的 key
+
+    def add(self, doc: dict):
+        doc_id = doc["id"]
+        key = self.key_func(doc)
+        old_key = self.doc_keys.get(doc_id, _MISSING)
+        if old_key is not _MISSING:
+            if old_key == key:
+                return
+            self._discard(doc_id, old_key)
+            if key is _MISSING:
+                del self.doc_keys[doc_id]
+        if key is _MISSING:
+            return
+        self.doc_keys[doc_id] = key
+        self.buckets.setdefault(key, {})[doc_id] = None
+
+    def remove(self, doc: dict):
+        key = self.doc_keys.pop(doc["id"], _MISSING)
+        if key is not _MISSING:
+            self._discard(doc["id"], key)
+
+    def _discard(self, doc_id, key):
+        bucket = self.buckets[key]
+        del bucket[doc_id]
+        if not bucket:
+            del self.buckets[key]
+
+    def clear(self):
+        self.buckets.clear()
+        self.doc_keys.clear()
+
+    def build(self, docs):
+        """以整批資料重建（載入時使用，比逐筆 add 快）"""
+        self.clear()
+        for doc in docs:
+            key = self.key_func(doc)
+            if key is _MISSING:
+                continue
+            self.doc_keys[doc["id"]] = key
+            self.buckets.setdefault(key, {})[doc["id"]] = None
+
+    def empty_copy(self):
+        return SecondaryIndex(self.collection, self.key_func)
+
+    def diff(self, expected) -> list:
+        """與重建的索引比對，回傳不一致的 key"""
+        problems = []
+        for key in expected.buckets.keys() | self.buckets.keys():
+            want = set(expected.buckets.get(key, ()))
+            have = set(self.buckets.get(key, ()))
+            if want != have:
+                problems.append({
+                    "collection": self.collection,
+                    "key": key,
+                    "missing": sorted(want - have),
+                    "unexpected": sorted(have - want),
+                })
+        return problems
+
+    def get(self, key) -> list:
+        """取得 key 對應的資料 id 列表"""
+        return list(self.buckets.get(key, ()))
+
+    def count(self, key) -> int:
+        return len(self.buckets.get(key, ()))
+
+class UniqueIndex:
+    """一對一索引：key -> 資料 id，只有一層 dict；key_func 回傳 _MISSING 的資料不列入索引
+
+    用於每個 key 只會對應一筆、且 key 建立後不會改變的資料（如簽到記錄的 (event_id, member_id)），
+    不必像 SecondaryIndex 為每個 key 各建一個 dict，也不必另記資料 id 對應的 key。
+    同一 key 有多筆時以先加入的為準。
+    """
+
+    def __init__(self, collection: str, key_func):
+        self.collection = collection
+        self.key_func = key_func
+        self.ids = {}  # key -> doc_id
+
+    def add(self, doc: dict):
+        key = self.key_func(doc)
+        if key is not _MISSING:
+            self.ids.setdefault(key, doc["id"])
+
+    def remove(self, doc: dict):
+        key = self.key_func(doc)
+        if key is not _MISSING and self.ids.get(key) == doc["id"]:
+            del self.ids[key]
+
+    def clear(self):
+        self.ids.clear()
+
+    def build(self, docs):
+        self.clear()
+        for doc in docs:
+            self.add(doc)
+
+    def empty_copy(self):
+        return UniqueIndex(self.collection, self.key_func)
+
+    def diff(self, expected) -> list:
+        problems = []
+        for key in expected.ids.keys() | self.ids.keys():
+            want, have = expected.ids.get(key), self.ids.get(key)
+            if want != have:
+                problems.append({"collection": self.collection, "key": key, "expected": want, "actual": have})
+        return problems
+
+    def get(self, key) -> Optional[str]:
+        """取得 key 對應的資料 id，沒有時回傳 None"""
+        return self.ids.get(key)
+
+class RankedIndex:
+    """積分排名索引：全體與各團隊各一份有序清單，查詢前 k 名與名次只需 O(log n)
+
+    排序鍵為 (-points, created_at, id)，同分時先建立的人員排前面。
+    """
+
+    def __init__(self, collection: str, team_func):
+        self.collection = collection
+        self.team_func = team_func
+        self.overall = SortedList()
+        self.teams = {}    # team -> SortedList
+        self.entries = {}  # member_id -> (排序鍵, team)
+
+    @staticmethod
+    def sort_key(doc: dict):
+        return (-doc["points"], doc.get("created_at") or "", doc["id"])
+
+    def add(self, doc: dict):
+        key = self.sort_key(doc)
+        team = self.team_func(doc)
+        if self.entries.get(doc["id"]) == (key, team):
+            return
+        self.remove(doc)
+        self.entries[doc["id"]] = (key, team)
+        self.overall.add(key)
+        self.teams.setdefault(team, SortedList()).add(key)
+
+    def remove(self, doc: dict):
+        entry = self.entries.pop(doc["id"], None)
+        if entry is None:
+            return
+        key, team = entry
+        self.overall.remove(key)
+        ranked = self.teams[team]
+        ranked.remove(key)
+        if not ranked:
+            del self.teams[team]
+
+    def clear(self):
+        self.overall.clear()
+        self.teams.clear()
+        self.entries.clear()
+
+    def build(self, docs):
+        """以整批資料重建，每份排名清單只排序一次"""
+        self.entries = {doc["id"]: (self.sort_key(doc), self.team_func(doc)) for doc in docs}
+        teams = {}
+        for key, team in self.entries.values():
+            teams.setdefault(team, []).append(key)
+        self.overall = SortedList(key for key, _ in self.entries.values())
+        self.teams = {team: SortedList(keys) for team, keys in teams.items()}
+
+    def empty_copy(self):
+        return RankedIndex(self.collection, self.team_func)
+
+    def diff(self, expected) -> list:
+        problems = []
+        if list(self.overall) != list(expected.overall):
+            problems.append({"collection": self.collection, "key": "排名（全體）"})
+        for team in expected.teams.keys() | self.teams.keys():
+            if list(self.teams.get(team, ())) != list(expected.teams.get(team, ())):
+                problems.append({"collection": self.collection, "key": f"排名（{team}）"})
+        return problems
+
+    def scope(self, team=_MISSING) -> SortedList:
+        """取得全體（不指定 team）或指定團隊的排名清單"""
+        if team is _MISSING:
+            return self.overall
+        return self.teams.get(team, SortedList())
+
+    def top(self, limit: int, team=_MISSING) -> list:
+        """前 limit 名的人員 id"""
+        return [key[2] for key in self.scope(team).islice(0, max(limit, 0))]
+
+    def rank(self, member_id: str, team=_MISSING) -> Optional[int]:
+        """人員名次（從 1 開始），不在排名中則回傳 None"""
+        entry = self.entries.get(member_id)
+        if entry is None:
+            return None
+        return self.scope(team).index(entry[0]) + 1
+
+    def window(self, start: int, stop: int, team=_MISSING) -> list:
+        """名次 start+1 到 stop 的人員 id"""
+        return [key[2] for key in self.scope(team).islice(max(start, 0), max(stop, 0))]
+
+class OrderedIndex:
+    """排序索引：依 (key, id) 排序，用於穩定的游標分頁"""
+
+    def __init__(self, collection: str, key_func):
+        self.collection = collection
+        self.key_func = key_func
+        self.positions = SortedList()
+        self.entries = {}  # doc_id -> (key, doc_id)
+
+    def add(self, doc: dict):
+        position = (self.key_func(doc), doc["id"])
+        if self.entries.get(doc["id"]) == position:
+            return
+        self.remove(doc)
+        self.entries[doc["id"]] = position
+        self.positions.add(position)
+
+    def remove(self, doc: dict):
+        position = self.entries.pop(doc["id"], None)
+        if position is not None:
+            self.positions.remove(position)
+
+    def clear(self):
+        self.positions.clear()
+        self.entries.clear()
+
+    def build(self, docs):
+        """以整批資料重建，只排序一次"""
+        self.entries = {doc["id"]: (self.key_func(doc), doc["id"]) for doc in docs}
+        self.positions = SortedList(self.entries.values())
+
+    def empty_copy(self):
+        return OrderedIndex(self.collection, self.key_func)
+
+    def diff(self, expected) -> list:
+        if list(self.positions) != list(expected.positions):
+            return [{"collection": self.collection, "key": "排序"}]
+        return []
+
+    def position(self, doc_id: str):
+        return self.entries.get(doc_id)
+
+    def after(self, position=None, limit: Optional[int] = None) -> list:
+        """取得 position 之後（不含）的位置，最多 limit 筆"""
+        if position is None:
+            positions = self.positions.islice(0, limit)
+        else:
+            positions = self.positions.irange(minimum=position, inclusive=(False, True))
+        return list(itertools.islice(positions, limit))
+
+class CounterIndex:
+    """統計計數：記錄每筆資料對各計數的貢獻，異動時只增減差額"""
+
+    def __init__(self, collection: str, contribution):
+        self.collection = collection
+        self.contribution = contribution  # doc -> {計數 key: 數值}
+        self.counters = {}
+        self.entries = {}  # doc_id -> 目前的貢獻
+
+    def _apply(self, contribution: dict, sign: int):
+        for key, amount in contribution.items():
+            value = self.counters.get(key, 0) + sign * amount
+            if value:
+                self.counters[key] = value
+            else:
+                self.counters.pop(key, None)
+
+    def add(self, doc: dict):
+        contribution = self.contribution(doc)
+        old = self.entries.get(doc["id"])
+        if old == contribution:
+            return
+        if old is not None:
+            self._apply(old, -1)
+        self.entries[doc["id"]] = contribution
+        self._apply(contribution, 1)
+
+    def remove(self, doc: dict):
+        old = self.entries.pop(doc["id"], None)
+        if old is not None:
+            self._apply(old, -1)
+
+    def clear(self):
+        self.counters.clear()
+        self.entries.clear()
+
+    def build(self, docs):
+        self.clear()
+        for doc in docs:
+            contribution = self.contribution(doc)
+            self.entries[doc["id"]] = contribution
+            self._apply(contribution, 1)
+
+    def empty_copy(self):
+        return CounterIndex(self.collection, self.contribution)
+
+    def diff(self, expected) -> list:
+        problems = []
+        for key in expected.counters.keys() | self.counters.keys():
+            want = expected.counters.get(key, 0)
+            have = self.counters.get(key, 0)
+            if abs(want - have) > 1e-6:
+                problems.append({"collection": self.collection, "key": key, "expected": want, "actual": have})
+        return problems
+
+    def get(self, key, default=0):
+        return self.counters.get(key, default)
+
+def month_last_day(day: date) -> date:
+    """所在月份的最後一天（十二月不必再算下個月，不會超出 date.max）"""
+    if day.month == 12:
+        return day.replace(day=31)
+    return day.replace(month=day.month + 1, day=1) - timedelta(days=1)
+
+class PointsHistoryIndex:
+    """簽到積分的時間分桶：依日、週（週一起算）、月加總每位人員的積分與簽到次數
+
+    期間以 checked_in_at 的日期計算，key 為 "2026-01-05"（日、週為該週週一）或 "2026-01"（月）。
+    團隊的積分由成員的分桶加總，人員更換團隊後歷史積分跟著人員走。
+    簽到記錄建立後不會修改，remove() 直接依記錄內容扣回分桶，不另存每筆記錄的分桶位置。
+    """
+
+    GRANULARITIES = ("day", "week", "month")
+
+    def __init__(self, collection: str):
+        self.collection = collection
+        self.periods = {g: {} for g in self.GRANULARITIES}  # 粒度 -> 期間 -> {member_id: [積分, 次數]}
+        self.members = {}  # member_id -> {日期: [積分, 次數]}
+        self.week_of = {}  # 日期 -> 該週週一（快取）
+
+    def period_keys(self, day: str):
+        week = self.week_of.get(day)
+        if week is None:
+            start = date.fromisoformat(day)
+            week = self.week_of[day] = (start - timedelta(days=start.weekday())).isoformat()
+        return (("day", day), ("week", week), ("month", day[:7]))
+
+    def entry(self, doc: dict):
+        """記錄所屬的 (member_id, 日期, 積分)；無法辨識日期的記錄不計入分桶，回傳 None"""
+        checked_in_at = doc.get("checked_in_at")
+        if not doc.get("member_id") or not isinstance(checked_in_at, str):
+            return None
+        try:
+            self.period_keys(checked_in_at[:10])
+        except ValueError:
+            return None
+        return doc["member_id"], checked_in_at[:10], doc.get("points_awarded") or 0
+
+    @staticmethod
+    def _apply(buckets: dict, key, points: float, sign: int):
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = [0, 0]
+        bucket[0] += sign * points
+        bucket[1] += sign
+        if not bucket[1]:
+            del buckets[key]
+
+    def _update(self, member_id: str, day: str, points: float, sign: int):
+        for granularity, period in self.period_keys(day):
+            members = self.periods[granularity].setdefault(period, {})
+            self._apply(members, member_id, points, sign)
+            if not members:
+                del self.periods[granularity][period]
+        days = self.members.setdefault(member_id, {})
+        self._apply(days, day, points, sign)
+        if not days:
+            del self.members[member_id]
+
+    def add(self, doc: dict):
+        entry = self.entry(doc)
+        if entry is not None:
+            self._update(*entry, 1)
+
+    def remove(self, doc: dict):
+        entry = self.entry(doc)
+        if entry is not None:
+            self._update(*entry, -1)
+
+    def clear(self):
+        for periods in self.periods.values():
+            periods.clear()
+        self.members.clear()
+
+    def build(self, docs):
+        """整批重建：先逐筆加總到日的分桶，再以整天為單位合計出週、月與各人員的分桶"""
+        self.clear()
+        day_periods = self.periods["day"]
+        for doc in docs:
+            member_id = doc.get("member_id")
+            checked_in_at = doc.get("checked_in_at")
+            if not member_id or not isinstance(checked_in_at, str):
+                continue
+            members = day_periods.get(checked_in_at[:10])
+            if members is None:
+                members = day_periods[checked_in_at[:10]] = {}
+            bucket = members.get(member_id)
+            if bucket is None:
+                members[member_id] = [doc.get("points_awarded") or 0, 1]
+            else:
+                bucket[0] += doc.get("points_awarded") or 0
+                bucket[1] += 1
+        for day, members in list(day_periods.items()):
+            try:
+                keys = self.period_keys(day)
+            except ValueError:
+                del day_periods[day]  # 無法辨識日期的記錄不計入分桶
+                continue
+            for granularity, period in keys[1:]:
+                totals = self.periods[granularity].setdefault(period, {})
+                for member_id, (points, count) in members.items():
+                    bucket = totals.get(member_id)
+                    if bucket is None:
+                        totals[member_id] = [points, count]
+                    else:
+                        bucket[0] += points
+                        bucket[1] += count
+            for member_id, (points, count) in members.items():
+                self.members.setdefault(member_id, {})[day] = [points, count]
+
+    def empty_copy(self):
+        return PointsHistoryIndex(self.collection)
+
+    def diff(self, expected) -> list:
+        problems = []
+        for member_id in expected.members.keys() | self.members.keys():
+            want = expected.members.get(member_id, {})
+            have = self.members.get(member_id, {})
+            for day in want.keys() | have.keys():
+                w, h = want.get(day, [0, 0]), have.get(day, [0, 0])
+                if w[1] != h[1] or abs(w[0] - h[0]) > 1e-6:
+                    problems.append({"collection": self.collection, "key": f"積分分桶（{member_id} {day}）",
+                                     "expected": w, "actual": h})
+        return problems
+
+    def totals(self, start: Optional[date], end: Optional[date]) -> dict:
+        """日期區間（含頭尾）內每位人員的 [積分, 次數]
+
+        區間先縮到有簽到的日期範圍內，再拆成完整的月、週與剩下的日，只合併這些分桶。
+        """
+        days = self.periods["day"]
+        if not days:
+            return {}
+        first, last = date.fromisoformat(min(days)), date.fromisoformat(max(days))
+        start = max(start, first) if start else first
+        end = min(end, last) if end else last
+        totals = {}
+        cursor = start
+        while cursor <= end:
+            month_end = month_last_day(cursor)
+            if cursor.day == 1 and month_end <= end:
+                members = self.periods["month"].get(cursor.isoformat()[:7])
+                period_end = month_end
+            elif cursor.weekday() == 0 and (end - cursor).days >= 6:
+                members = self.periods["week"].get(cursor.isoformat())
+                period_end = cursor + timedelta(days=6)
+            else:
+                members = days.get(cursor.isoformat())
+                period_end = cursor
+            for member_id, (points, count) in (members or {}).items():
+                total = totals.get(member_id)
+                if total is None:
+                    totals[member_id] = [points, count]
+                else:
+                    total[0] += points
+                    total[1] += count
+            if period_end >= end:
+                break
+            cursor = period_end + timedelta(days=1)
+        return totals
+
+    def series(self, member_ids, granularity: str, start: Optional[date], end: Optional[date]) -> list:
+        """多位人員合計的積分時間序列 [(期間, 積分, 次數)]，依期間排序"""
+        start_key = start.isoformat() if start else ""
+        end_key = end.isoformat() if end else "9999"
+        buckets = {}
+        for member_id in member_ids:
+            for day, (points, count) in self.members.get(member_id, {}).items():
+                if not start_key <= day <= end_key:
+                    continue
+                period = dict(self.period_keys(day))[granularity]
+                bucket = buckets.setdefault(period, [0, 0])
+                bucket[0] += points
+                bucket[1] += count
+        return [(period, points, count) for period, (points, count) in sorted(buckets.items())]
+
+class PositionList:
+    """已排序的位置列表，提供與 OrderedIndex.after() 相同的游標查詢"""
+
+    def __init__(self, positions: list):
+        self.positions = positions
+
+    def after(self, position=None, limit: Optional[int] = None) -> list:
+        start = bisect.bisect_right(self.positions, position) if position is not None else 0
+        return self.positions[start:None if limit is None else start + limit]
+
+# sqlite 儲存引擎的簽到記錄不常駐記憶體，以下類別提供與記憶體索引相同的查詢介面，
+# 改為查詢資料表的索引（見 sqlite_store.py）；索引由 SQLite 維護，不列入 collection_indexes
+
+class TableIndex:
+    """對應 SecondaryIndex（unique 時對應 UniqueIndex）：以 columns 各欄位的值為 key 查詢資料 id"""
+
+    def __init__(self, collection: str, columns: tuple, unique: bool = False):
+        self.collection = collection
+        self.columns = columns
+        self.unique = unique
+
+    def conditions(self, key) -> dict:
+        return dict(zip(self.columns, key if len(self.columns) > 1 else (key,)))
+
+    def get(self, key):
+        doc_ids = db[self.collection].find_ids(**self.conditions(key))
+        if self.unique:
+            return doc_ids[0] if doc_ids else None
+        return doc_ids
+
+class TableOrder:
+    """對應 OrderedIndex：依 columns（最後一欄為 id）排序的游標查詢，where() 加上篩選條件"""
+
+    def __init__(self, collection: str, columns: tuple, conditions: Optional[dict] = None):
+        self.collection = collection
+        self.columns = columns
+        self.conditions = conditions or {}
+
+    def where(self, **conditions) -> "TableOrder":
+        return TableOrder(self.collection, self.columns, {**self.conditions, **conditions})
+
+    def after(self, position=None, limit: Optional[int] = None) -> list:
+        return db[self.collection].positions_after(self.columns, position, limit, **self.conditions)
+
+class TablePointsHistory:
+    """對應 PointsHistoryIndex：期間積分直接加總資料表中的簽到記錄"""
+
+    period_keys = PointsHistoryIndex.period_keys
+
+    def __init__(self, collection: str):
+        self.collection = collection
+        self.week_of = {}  # 日期 -> 該週週一（快取）
+
+    def totals(self, start: Optional[date], end: Optional[date]) -> dict:
+        return db[self.collection].points_by("member_id", *date_range_keys(start, end))
+
+    def series(self, member_ids, granularity: str, start: Optional[date], end: Optional[date]) -> list:
+        buckets = {}
+        for day, (points, count) in db[self.collection].points_by(
+            "day", *date_range_keys(start, end), member_ids=member_ids
+        ).items():
+            period = dict(self.period_keys(day))[granularity]
+            bucket = buckets.setdefault(period, [0, 0])
+            bucket[0] += points
+            bucket[1] += count
+        return [(period, points, count) for period, (points, count) in sorted(buckets.items())]
+
+# 中日韓文字（漢字、假名、諺文）之間沒有空白分詞，以單字與相鄰兩字建立索引；其他文字依單字的前綴建立索引
+CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+CJK_TOKEN = re.compile(f"[{CJK_CHARS}]+")
+SEARCH_TOKEN = re.compile(f"[{CJK_CHARS}]+|[^\\W_{CJK_CHARS}]+")
+SEARCH_PREFIX_MAX = 20  # 單字前綴最多索引的長度，更長的查詢以前 20 字找候選再逐筆比對
+
+def search_text(value) -> str:
+    """搜尋用的正規化：全形轉半形、不分大小寫"""
+    return unicodedata.normalize("NFKC", value).casefold() if value else ""
+
+def search_terms(text: str) -> list:
+    """拆成搜尋詞：(True, 中日韓連續文字) 或 (False, 單字)"""
+    return [(CJK_TOKEN.fullmatch(token) is not None, token) for token in SEARCH_TOKEN.findall(text)]
+
+class SearchIndex:
+    """n-gram 搜尋索引（人員姓名與電子郵件帳號），供輸入時即時搜尋
+
+    中日韓文字以單字與相鄰兩字（bigram）索引，查詢時取各 bigram 的交集再確認連續出現；
+    其他文字（英文、數字）以每個單字的前綴索引，查詢的每個單字須為某個單字的開頭。
+    查詢的所有詞都要符合（姓名或電子郵件皆可），結果依符合程度排序：
+    姓名完全相同、姓名開頭相同、姓名其他位置符合、需電子郵件才符合。
+    """
+
+    def __init__(self, collection: str, text_func):
+        self.collection = collection
+        self.text_func = text_func  # 回傳要索引的文字 tuple，第一個（姓名）排序時優先
+        self.postings = {}  # n-gram 或前綴 -> {doc_id}
+        self.entries = {}   # doc_id -> 各欄位的 (正規化文字, 單字)；移除時由此重新算出索引的 key
+
+    @staticmethod
+    def grams(fields) -> set:
+        keys = set()
+        for text, _ in fields:
+            for cjk, token in search_terms(text):
+                if cjk:
+                    keys.update(token)
+                    keys.update(token[i:i + 2] for i in range(len(token) - 1))
+                else:
+                    keys.update(token[:i] for i in range(1, min(len(token), SEARCH_PREFIX_MAX) + 1))
+        return keys
+
+    def add(self, doc: dict):
+        fields = []
+        for value in self.text_func(doc):
+            text = search_text(value)
+            fields.append((text, tuple(token for cjk, token in search_terms(text) if not cjk)))
+        fields = tuple(fields)
+        if self.entries.get(doc["id"]) == fields:
+            return
+        self.remove(doc)
+        self.entries[doc["id"]] = fields
+        postings = self.postings
+        for key in self.grams(fields):
+            bucket = postings.get(key)
+            if bucket is None:
+                postings[key] = {doc["id"]}
+            else:
+                bucket.add(doc["id"])
+
+    def remove(self, doc: dict):
+        fields = self.entries.pop(doc["id"], None)
+        if fields is None:
+            return
+        for key in self.grams(fields):
+            postings = self.postings[key]
+            postings.discard(doc["id"])
+            if not postings:
+                del self.postings[key]
+
+    def clear(self):
+        self.postings.clear()
+        self.entries.clear()
+
+    def build(self, docs):
+        self.clear()
+        for doc in docs:
+            self.add(doc)
+
+    def empty_copy(self):
+        return SearchIndex(self.collection, self.text_func)
+
+    def diff(self, expected) -> list:
+        problems = []
+        for key in expected.postings.keys() | self.postings.keys():
+            want = expected.postings.get(key, set())
+            have = self.postings.get(key, set())
+            if want != have:
+                problems.append({
+                    "collection": self.collection,
+                    "key": f"搜尋（{key}）",
+                    "missing": sorted(want - have),
+                    "unexpected": sorted(have - want),
+                })
+        return problems
+
+    @staticmethod
+    def term_matches(term, text: str, words: tuple) -> bool:
+        cjk, token = term
+        if cjk:
+            return token in text
+        return any(word.startswith(token) for word in words)
+
+    def search(self, query: str, doc_ids=None) -> list:
+        """回傳符合的 [(排序鍵, doc_id)]（未排序）；doc_ids 限定候選範圍（如團隊成員）"""
+        query = search_text(query)
+        terms = search_terms(query)
+        if not terms:
+            return []
+        # 每個詞取一個最具鑑別度的 key：中日韓取 bigram（單字時取該字），其他取前綴
+        keys = []
+        for cjk, token in terms:
+            if cjk:
+                keys.extend([token] if len(token) == 1 else [token[i:i + 2] for i in range(len(token) - 1)])
+            else:
+                keys.append(token[:SEARCH_PREFIX_MAX])
+        postings = sorted((self.postings.get(key, set()) for key in set(keys)), key=len)
+        candidates = postings[0] if doc_ids is None else postings[0].intersection(doc_ids)
+        for other in postings[1:]:
+            if not candidates:
+                break
+            candidates = candidates & other
+
+        results = []
+        for doc_id in candidates:
+            fields = self.entries[doc_id]
+            if not all(any(self.term_matches(term, text, words) for text, words in fields) for term in terms):
+                continue
+            name, name_words = fields[0]
+            if name == query:
+                score = 0
+            elif name.startswith(query):
+                score = 1
+            elif all(self.term_matches(term, name, name_words) for term in terms):
+                score = 2
+            else:
+                score = 3
+            # 同一級中較短的（較接近查詢的）在前；只有電子郵件符合時依帳號長度
+            length = len(name) if score < 3 else min(len(text) for text, _ in fields[1:])
+            results.append(((score, length, name, doc_id), doc_id))
+        return results
+
+def event_status_value(event: dict) -> str:
+    status = event["status"]
+    return status.value if isinstance(status, EventStatus) else status
+
+def member_contribution(member: dict) -> dict:
+    team = member.get("team_id")
+    return {
+        "members": 1,
+        "points": member["points"],
+        ("team_members", team): 1,
+        ("team_points", team): member["points"],
+    }
 
-def load_db():
-    """從 JSON 檔案載入資料"""
+def event_contribution(event: dict) -> dict:
+    return {"events": 1, "active_events": 1 if event_status_value(event) == "active" else 0}
+
+if STORAGE_BACKEND == "sqlite":
+    # 簽到記錄只存在資料庫中，改由資料表的索引查詢
+    attendance_index = TableIndex("checkin_records", ("event_id", "member_id"), unique=True)
+    records_by_member = TableIndex("checkin_records", ("member_id",))
+    records_by_event = TableIndex("checkin_records", ("event_id",))
+    records_by_op = TableIndex("checkin_records", ("client_op_id",), unique=True)
+    records_by_time = TableOrder("checkin_records", ("checked_in_at", "id"))
+    points_history = TablePointsHistory("checkin_records")
+else:
+    # 簽到索引：(event_id, member_id) -> record_id，重複簽到檢查只需 O(1)
+    attendance_index = UniqueIndex("checkin_records", lambda r: (r["event_id"], r["member_id"]))
+    records_by_member = SecondaryIndex("checkin_records", lambda r: r["member_id"])
+    records_by_event = SecondaryIndex("checkin_records", lambda r: r["event_id"])
+    # 離線同步的操作編號 -> record_id，重送時不會重複簽到
+    records_by_op = UniqueIndex("checkin_records", lambda r: r.get("client_op_id", _MISSING))
+    records_by_time = OrderedIndex("checkin_records", lambda r: r["checked_in_at"])
+    points_history = PointsHistoryIndex("checkin_records")
+# 人員以 team_id 關聯團隊，團隊名稱只在輸出時解析
+members_by_team = SecondaryIndex("members", lambda m: m.get("team_id"))
+member_ranking = RankedIndex("members", lambda m: m.get("team_id"))
+teams_by_name = SecondaryIndex("teams", lambda t: t["name"])
+# 電子郵件只索引 @ 前的帳號，網域幾乎人人相同，索引只會佔用大量記憶體
+member_search = SearchIndex("members", lambda m: (m.get("name"), (m.get("email") or "").partition("@")[0]))
+member_stats = CounterIndex("members", member_contribution)
+event_stats = CounterIndex("events", event_contribution)
+
+# 各集合需要同步維護的索引
+collection_indexes = {
+    "members": [members_by_team, member_ranking, member_stats, member_search],
+    "teams": [teams_by_name],
+    "events": [event_stats],
+    "checkin_records": [] if STORAGE_BACKEND == "sqlite" else [
+        attendance_index, records_by_member, records_by_event, records_by_op, records_by_time, points_history
+    ],
+}
+
+def rebuild_indexes(data):
+    """依資料重建所有記憶體索引（載入或整批重新同步時呼叫）"""
+    for collection, indexes in collection_indexes.items():
+        # 沒有記憶體索引的集合（sqlite 的簽到記錄）不必讀出資料
+        if not indexes:
+            continue
+        docs = list(data[collection].values())
+        for index in indexes:
+            index.build(docs)
+
+def check_indexes() -> list:
+    """比對索引與主資料，回傳不一致之處（空列表表示一致）"""
+    problems = []
+    for collection, indexes in collection_indexes.items():
+        if not indexes:
+            continue
+        docs = list(db[collection].values())
+        for index in indexes:
+            expected = index.empty_copy()
+            expected.build(docs)
+            problems.extend(index.diff(expected))
+    return problems
+
+def get_docs(collection: str, doc_ids) -> list:
+    """依 id 列表取出資料（sqlite 的資料表一次查詢多筆）"""
+    docs = db[collection]
+    if hasattr(docs, "get_many"):
+        return docs.get_many(doc_ids)
+    return [docs[doc_id] for doc_id in doc_ids if doc_id in docs]
+
+def has_checked_in(event_id: str, member_id: str) -> bool:
+    """檢查人員是否已在該事件簽到"""
+    return attendance_index.get((event_id, member_id)) is not None
+
+def team_name(team_id: Optional[str]) -> Optional[str]:
+    team = db["teams"].get(team_id) if team_id else None
+    return team["name"] if team else None
+
+def find_team_id(name: Optional[str]) -> Optional[str]:
+    """依名稱找團隊 id（同名時取最早建立的）"""
+    team_ids = teams_by_name.get(name)
+    return team_ids[0] if team_ids else None
+
+def ensure_team(name: str) -> str:
+    """依名稱找團隊 id，找不到時自動建立"""
+    team_id = find_team_id(name)
+    if team_id is None:
+        team_id = f"team-{uuid.uuid4().hex[:8]}"
+        put_doc("teams", {
+            "id": team_id,
+            "name": name,
+            "description": None,
+            "created_at": datetime.now().isoformat()
+        })
+    return team_id
+
+def render_member(member: dict) -> dict:
+    """輸出人員資料，附上解析後的團隊名稱"""
+    return {**member, "team": team_name(member.get("team_id"))}
+
+# ============== 資料異動 ==============
+# 所有寫入都經過以下函數，記錄待提交的異動並維護索引，由 commit() / save_db() 一次提交
+# 每筆異動為 (op, collection, doc_id)，op 為 put / del / clear
+pending_changes = []
+
+# 資料版本：每次異動遞增，各集合記錄最後一次異動時的版本，用於 ETag
+data_version = 0
+collection_versions = {"members": 0, "teams": 0, "events": 0, "checkin_records": 0}
+# 各集合已寫入磁碟的版本，與 collection_versions 相同時表示該集合沒有尚未寫入的異動
+committed_versions = dict(collection_versions)
+
+def bump_version(collection: str):
+    global data_version
+    data_version += 1
+    collection_versions[collection] = data_version
+
+def put_doc(collection: str, doc: dict):
+    """新增或更新一筆資料（原地修改後也要呼叫）"""
+    with timed_phase("mutation"):
+        db[collection][doc["id"]] = doc
+        for index in collection_indexes[collection]:
+            index.add(doc)
+        pending_changes.append(("put", collection, doc["id"]))
+        bump_version(collection)
+
+def delete_doc(collection: str, doc_id: str):
+    """刪除一筆資料，回傳被刪除的資料"""
+    with timed_phase("mutation"):
+        doc = db[collection].pop(doc_id, None)
+        if doc is not None:
+            for index in collection_indexes[collection]:
+                index.remove(doc)
+            pending_changes.append(("del", collection, doc_id))
+            bump_version(collection)
+    return doc
+
+def clear_collection(collection: str):
+    """清空整個集合"""
+    with timed_phase("mutation"):
+        db[collection].clear()
+        for index in collection_indexes[collection]:
+            index.clear()
+        pending_changes.append(("clear", collection, None))
+        bump_version(collection)
+
+def add_checkin_record(record: dict):
+    """新增簽到記錄"""
+    put_doc("checkin_records", record)
+
+def remove_checkin_record(record_id: str):
+    """刪除簽到記錄，回傳被刪除的記錄"""
+    return delete_doc("checkin_records", record_id)
+
+def clear_checkin_records():
+    """清空所有簽到記錄"""
+    clear_collection("checkin_records")
+
+# ============== 資料持久化 ==============
+# snapshot 模式：每次提交重寫整份 db.json
+# journal 模式：每次提交只在日誌檔追加一行，定期壓縮回 db.json
+# sqlite 儲存引擎：資料存於 SQLITE_FILE，見 sqlite_store.py
+# SNAPSHOT_FORMAT=binary 時快照改存為 db.bin（見 binary_snapshot.py），載入時使用較新的快照檔
+JOURNAL_FILE = os.path.splitext(DATA_FILE)[0] + ".journal"
+BINARY_FILE = os.path.splitext(DATA_FILE)[0] + ".bin"
+journal_entries = 0  # 上次壓縮後日誌內的提交數
+store = None  # sqlite 儲存引擎
+
+def apply_journal_op(data, op: dict):
+    """將一筆日誌異動套用到資料上"""
+    collection = data[op["c"]]
+    if op["op"] == "put":
+        collection[op["v"]["id"]] = op["v"]
+    elif op["op"] == "del":
+        collection.pop(op["id"], None)
+    elif op["op"] == "clear":
+        collection.clear()
+
+def replay_journal(data) -> int:
+    """在快照之上重播日誌，回傳重播的提交數
+
+    最後一行可能因當機而寫入不完整（沒有換行或無法解析），整筆提交視為未發生，
+    並將日誌截斷到最後一個完整的行，之後追加的提交才不會接在殘缺的內容後面。
+    """
+    if not os.path.exists(JOURNAL_FILE):
+        return 0
+    count = 0
+    valid_size = 0
+    with open(JOURNAL_FILE, 'rb') as f:
+        for line in f:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("missing newline")
+                entry = json.loads(line)
+            except ValueError:
+                print("日誌尾端不完整，已略過")
+                break
+            for op in entry["ops"]:
+                apply_journal_op(data, op)
+            count += 1
+            valid_size += len(line)
+    if valid_size < os.path.getsize(JOURNAL_FILE):
+        with open(JOURNAL_FILE, 'r+b') as f:
+            f.truncate(valid_size)
+            f.flush()
+            os.fsync(f.fileno())
+    return count
+
+def latest_snapshot_file() -> Optional[str]:
+    """db.json 與 db.bin 中較新的一個（切換格式後舊格式的檔案不會再更新）"""
+    files = [path for path in (DATA_FILE, BINARY_FILE) if os.path.exists(path)]
+    return max(files, key=os.path.getmtime) if files else None
+
+def read_snapshot(path: str) -> dict:
+    import binary_snapshot
+    if binary_snapshot.is_binary_snapshot(path):
+        return binary_snapshot.read(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_json_db():
+    """從快照檔案（db.json 或 db.bin）載入資料，並重播尚未壓縮的日誌"""
+    global journal_entries
     default_db = {
         "members": {},
         "teams": {},
         "events": {},
         "checkin_records": {}
     }
+    data = default_db
     try:
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # 確保所有必要的 key 都存在
-                for key in default_db:
-                    if key not in data:
-                        data[key] = {}
-                return data
+        snapshot_file = latest_snapshot_file()
+        if snapshot_file:
+            data = read_snapshot(snapshot_file)
+            # 確保所有必要的 key 都存在
+            for key in default_db:
+                if key not in data:
+                    data[key] = {}
+        journal_entries = replay_journal(data)
+        if journal_entries and PERSIST_MODE != "journal":
+            # 從 journal 模式切回 snapshot 模式：先將日誌併入快照，避免之後重播舊異動
+            compact_journal(data)
+            journal_entries = 0
     except Exception as e:
         print(f"載入資料失敗: {e}")
-    return default_db
+        data = default_db
+    return data
+
+def load_db():
+    """依 STORAGE_BACKEND 載入資料並建立索引"""
+    global store
+    # 載入期間建立大量長期存在的物件，暫停垃圾回收避免反覆掃描
+    gc.disable()
+    try:
+        if STORAGE_BACKEND == "sqlite":
+            from sqlite_store import SqliteStore
+            store = SqliteStore(SQLITE_FILE, track_changes=WORKERS > 1)
+            data = store.tables
+        else:
+            data = load_json_db()
+        records = None
+        if STORAGE_BACKEND != "sqlite" and RECORD_STORE == "columnar":
+            records = CheckinRecordStore()
+            records.load(data["checkin_records"])
+        # 索引以載入的 dict 建立（不必再從欄位組出每筆記錄），之後才換成欄位式儲存
+        rebuild_indexes(data)
+        if records is not None:
+            data["checkin_records"] = records
+    finally:
+        gc.enable()
+    # 載入的資料移出垃圾回收的追蹤範圍，之後的回收不必再掃描
+    gc.freeze()
+    return data
+
+def copy_db():
+    """複製一份資料供其他執行緒序列化（每筆資料都是扁平 dict，淺複製即可；欄位式的簽到記錄直接複製欄位）"""
+    return {
+        name: collection.copy() if isinstance(collection, CheckinRecordStore)
+        else {k: dict(v) for k, v in collection.items()}
+        for name, collection in db.items()
+    }
+
+def write_snapshot(data) -> int:
+    """將整份資料寫入 db.json 或 db.bin（先寫暫存檔再改名，避免寫到一半損毀），回傳寫入的位元組數"""
+    # 欄位式的簽到記錄在此（寫入執行緒中）才組成 dict
+    data = {name: docs if isinstance(docs, dict) else dict(docs.items()) for name, docs in data.items()}
+    if SNAPSHOT_FORMAT == "binary":
+        import binary_snapshot
+        return binary_snapshot.write(data, BINARY_FILE)
+    os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
+    tmp_file = DATA_FILE + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+        size = os.fstat(f.fileno()).st_size
+    os.replace(tmp_file, DATA_FILE)
+    return size
+
+def collect_journal_ops(changes):
+    """將待提交異動整理成日誌內容，同一筆資料只保留最後狀態"""
+    ops = []
+    seen = set()
+    cleared = set()
+    for op, collection, doc_id in reversed(changes):
+        if collection in cleared:
+            continue
+        if op == "clear":
+            cleared.add(collection)
+            ops.append({"op": "clear", "c": collection})
+            continue
+        if (collection, doc_id) in seen:
+            continue
+        seen.add((collection, doc_id))
+        doc = db[collection].get(doc_id)
+        if doc is None:
+            ops.append({"op": "del", "c": collection, "id": doc_id})
+        else:
+            ops.append({"op": "put", "c": collection, "v": doc})
+    ops.reverse()
+    return ops
+
+def append_journal(line: str) -> int:
+    """追加一筆提交到日誌並 fsync，回傳寫入的位元組數"""
+    os.makedirs(os.path.dirname(JOURNAL_FILE), exist_ok=True)
+    raw = (line + "\n").encode()
+    with open(JOURNAL_FILE, 'ab') as f:
+        f.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
+    return len(raw)
+
+def compact_journal(data) -> int:
+    """將日誌併入新的 db.json 快照並清空日誌，回傳寫入的位元組數"""
+    size = write_snapshot(data)
+    # 快照已包含所有異動；若在截斷前當機，重播日誌也只會得到相同結果
+    with open(JOURNAL_FILE, 'w', encoding='utf-8'):
+        pass
+    return size
+
+def prepare_commit():
+    """在事件迴圈上擷取待提交的內容，回傳可交給 write_commit() 在其他執行緒寫入的資料"""
+    global journal_entries
+    if not pending_changes:
+        return None
+    changes = pending_changes[:]
+    pending_changes.clear()
+    batch = {"changes": changes, "line": None, "snapshot": None, "versions": dict(collection_versions)}
+    if STORAGE_BACKEND == "sqlite":
+        batch["statements"], batch["written"] = store.prepare(collect_journal_ops(changes))
+    elif PERSIST_MODE == "journal":
+        ops = collect_journal_ops(changes)
+        if ops:
+            batch["line"] = json.dumps({"ops": ops}, ensure_ascii=False, separators=(",", ":"), default=str)
+            journal_entries += 1
+        if journal_entries >= JOURNAL_COMPACT_EVERY:
+            batch["snapshot"] = copy_db()
+            journal_entries = 0
+    else:
+        batch["snapshot"] = copy_db()
+    return batch
+
+def write_commit(batch) -> int:
+    """將 prepare_commit() 的結果寫入磁碟（不碰全域資料，可在執行緒中執行），回傳寫入的位元組數"""
+    if STORAGE_BACKEND == "sqlite":
+        return store.write(batch["statements"])
+    if PERSIST_MODE == "journal":
+        size = 0
+        if batch["line"]:
+            size += append_journal(batch["line"])
+        if batch["snapshot"] is not None:
+            size += compact_journal(batch["snapshot"])
+        return size
+    return write_snapshot(batch["snapshot"])
+
+def finish_commit(batch):
+    """寫入成功後的收尾（需在事件迴圈上執行）"""
+    if STORAGE_BACKEND == "sqlite":
+        store.settle(batch["written"])
+    committed_versions.update(batch["versions"])
+
+def requeue_commit(batch):
+    """寫入失敗時將異動放回佇列，下次寫入時重試"""
+    pending_changes[:0] = batch["changes"]
 
 def save_db():
-    """儲存資料到 JSON 檔案"""
+    """同步提交待處理的異動"""
+    batch = prepare_commit()
+    if batch is None:
+        return
+    start = time.perf_counter()
     try:
-        os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(db, f, ensure_ascii=False, indent=2)
+        size = write_commit(batch)
+        finish_commit(batch)
     except Exception as e:
+        requeue_commit(batch)
+        record_commit(time.perf_counter() - start, None)
         print(f"儲存資料失敗: {e}")
+        return
+    record_commit(time.perf_counter() - start, size)
+
+# ============== 背景批次寫入 ==============
+# 請求只把異動留在記憶體並通知背景工作，由背景工作把一段時間內的異動合併成一次寫入
+# 請求帶上 X-Wait-Durable: 1 標頭時，會等到資料寫入磁碟後才回應
+wait_durable = ContextVar("wait_durable", default=False)
+
+class GroupCommitFlusher:
+    def __init__(self, interval: Optional[float]):
+        self.interval = interval  # 沒有請求等待時的寫入間隔（None 為只在有請求等待時寫入）
+        self.wake = asyncio.Event()
+        self.waiters = []
+        self.stopping = False
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """停止背景工作，並寫入剩下的異動"""
+        self.stopping = True
+        self.wake.set()
+        await self.task
+
+    def notify(self):
+        if len(pending_changes) >= FLUSH_MAX_PENDING:
+            self.wake.set()
+
+    async def wait_durable(self):
+        """等待目前為止的異動寫入磁碟"""
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append(future)
+        self.wake.set()
+        await future
+
+    async def run(self):
+        while not self.stopping:
+            try:
+                await asyncio.wait_for(self.wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            await self.flush()
+        await self.flush()
+
+    async def flush(self):
+        waiters, self.waiters = self.waiters, []
+        batch = prepare_commit()
+        error = None
+        if batch is not None:
+            start = time.perf_counter()
+            try:
+                size = await asyncio.to_thread(write_commit, batch)
+                finish_commit(batch)
+                record_commit(time.perf_counter() - start, size)
+            except Exception as e:
+                requeue_commit(batch)
+                record_commit(time.perf_counter() - start, None)
+                print(f"儲存資料失敗: {e}")
+                error = e
+        for future in waiters:
+            if future.done():
+                continue
+            if error:
+                future.set_exception(HTTPException(status_code=500, detail="儲存資料失敗"))
+            else:
+                future.set_result(None)
+
+flusher: Optional[GroupCommitFlusher] = None
+
+async def commit():
+    """提交本次請求的異動（背景寫入未啟用時同步寫入）"""
+    with timed_phase("persistence"):
+        if flusher is None:
+            save_db()
+            return
+        flusher.notify()
+        # 多工作行程時須在釋放寫入鎖前寫入，同時持有鎖的請求合併成一次提交
+        if wait_durable.get() or shared_lock is not None:
+            await flusher.wait_durable()
+
+class DurabilityMiddleware:
+    """讀取寫入請求的 X-Wait-Durable 標頭，決定是否等待資料寫入磁碟
+
+    直接以 ASGI 實作，只檢查標頭，不像 @app.middleware 每個請求都要多建立一層 Request 與背景工作。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] not in ("GET", "HEAD", "OPTIONS"):
+            for name, value in scope["headers"]:
+                if name == b"x-wait-durable":
+                    wait_durable.set(value.decode("latin-1").lower() in ("1", "true", "yes"))
+                    break
+        await self.app(scope, receive, send)
+
+app.add_middleware(DurabilityMiddleware)
+
+# ============== 多工作行程 ==============
+# WEB_CONCURRENCY > 1 時，各工作行程共用同一個 SQLite 資料庫，記憶體中的資料與索引只是快取：
+# - 寫入請求先取得跨行程寫入鎖並同步其他行程的異動，再執行並等待寫入完成，最後才釋放鎖；
+#   同一行程內同時到達的寫入請求共用一次取得的鎖，異動合併成一次提交
+# - 其他行程的異動記錄在 changes 表，讀取請求前與背景定時檢查，重新讀取受影響的資料並更新索引
+
+class SharedWriteLock:
+    """跨行程寫入鎖（fcntl.flock）
+
+    同一行程內的請求共用一次取得的鎖：已持有鎖未滿 SHARED_LOCK_JOIN_SECONDS 時，新到的請求直接加入，
+    最後一個請求離開時才釋放；超過時限後新的請求等這次釋放後再重新取得，讓其他行程有機會寫入。
+    """
+
+    def __init__(self, path: str):
+        import fcntl
+        self.fcntl = fcntl
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self.condition = asyncio.Condition()
+        self.holders = 0  # 目前持有鎖的請求數
+        self.acquired_at = 0.0
+
+    def acquire_blocking(self):
+        """啟動時使用（尚無事件迴圈）"""
+        self.fcntl.flock(self.fd, self.fcntl.LOCK_EX)
+
+    def release(self):
+        self.fcntl.flock(self.fd, self.fcntl.LOCK_UN)
+
+    def joinable(self) -> bool:
+        return not self.holders or time.monotonic() - self.acquired_at < SHARED_LOCK_JOIN_SECONDS
+
+    async def __aenter__(self):
+        async with self.condition:
+            await self.condition.wait_for(self.joinable)
+            if not self.holders:
+                # 以非阻塞方式輪詢，等待期間不佔用事件迴圈，請求取消時也不會在背景取得鎖
+                delay = 0.001
+                while True:
+                    try:
+                        self.fcntl.flock(self.fd, self.fcntl.LOCK_EX | self.fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        await asyncio.sleep(delay)
+                        delay = min(delay * 2, 0.02)
+                self.acquired_at = time.monotonic()
+            self.holders += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        async with self.condition:
+            self.holders -= 1
+            if not self.holders:
+                self.release()
+                self.condition.notify_all()
+
+shared_lock = SharedWriteLock(SQLITE_FILE + ".lock") if WORKERS > 1 else None
+
+def bump_synced_version(collection: str):
+    """套用其他行程已寫入的異動後遞增版本；本行程沒有尚未寫入的異動時，新版本也已寫入"""
+    committed = committed_versions[collection] == collection_versions[collection]
+    bump_version(collection)
+    if committed:
+        committed_versions[collection] = collection_versions[collection]
+
+def sync_from_store():
+    """套用其他工作行程寫入的異動，回傳是否有異動"""
+    changes = store.poll_changes()
+    if changes == []:
+        return False
+    if changes is None:
+        # 落後太多，整批重新載入
+        store.reload()
+        rebuild_indexes(db)
+        for collection in collection_versions:
+            bump_synced_version(collection)
+    else:
+        for op, collection, doc_id in changes:
+            if op == "clear":
+                if db[collection].cached:
+                    db[collection].reload()
+                for index in collection_indexes[collection]:
+                    index.clear()
+            else:
+                old = db[collection].get(doc_id) if collection_indexes[collection] else None
+                doc = store.refresh(collection, doc_id)
+                for index in collection_indexes[collection]:
+                    if doc is not None:
+                        index.add(doc)
+                    elif old is not None:
+                        index.remove(old)
+            bump_synced_version(collection)
+    # 推送內容只在寫入的行程產生，其他行程的連線改為通知重新載入
+    publish("resync", {})
+    return True
+
+async def sync_periodically():
+    """閒置時也定期同步，讓連在本行程的即時推送得知其他行程的異動"""
+    while True:
+        await asyncio.sleep(SYNC_INTERVAL_SECONDS)
+        try:
+            sync_from_store()
+        except Exception as e:
+            print(f"同步異動失敗: {e}")
+
+async def shared_store_middleware(request: Request, call_next):
+    """寫入請求持有跨行程寫入鎖執行，所有請求執行前先同步其他行程的異動（只在多工作行程時註冊）"""
+    if request.method in ("GET", "HEAD", "OPTIONS"):
+        sync_from_store()
+        return await call_next(request)
+    async with shared_lock:
+        sync_from_store()
+        return await call_next(request)
+
+if shared_lock is not None:
+    app.middleware("http")(shared_store_middleware)
+
+# ============== 監控指標 ==============
+# GET /metrics 以 Prometheus 文字格式輸出（見 metrics.py），多工作行程時每個行程各自統計
+# 請求依路由樣板（如 /api/members/{member_id}）分組，不會因路徑參數產生大量不同的標籤
+from metrics import Registry
+
+metrics = Registry()
+http_requests = metrics.counter(
+    "signin_http_requests_total", "HTTP 請求數", ("method", "route", "status"))
+http_duration = metrics.histogram(
+    "signin_http_request_duration_seconds", "HTTP 請求處理時間（秒）", ("method", "route"))
+commit_total = metrics.counter(
+    "signin_persist_commits_total", "寫入磁碟的提交次數", ("result",))
+commit_duration = metrics.histogram(
+    "signin_persist_commit_duration_seconds", "每次提交寫入磁碟的時間（秒）")
+commit_bytes = metrics.counter(
+    "signin_persist_written_bytes_total", "寫入磁碟的位元組數（SQLite 為約略值）")
+checkin_duplicates = metrics.counter(
+    "signin_checkin_duplicates_total", "因已簽到而略過的簽到人次")
+auth_failures = metrics.counter(
+    "signin_auth_failures_total", "認證失敗次數", ("reason",))
+metrics.gauge(
+    "signin_collection_size", "各集合的資料筆數", lambda: {
+        ("members",): member_stats.get("members"),
+        ("teams",): len(db["teams"]),
+        ("events",): event_stats.get("events"),
+        ("checkin_records",): len(db["checkin_records"]),
+    }, ("collection",))
+metrics.gauge(
+    "signin_persist_pending_changes", "尚未寫入磁碟的異動數", lambda: {(): len(pending_changes)})
+metrics.gauge(
+    "signin_sse_connections", "即時推送連線數", lambda: {(): len(broadcaster.subscribers)})
+metrics.counter_func(
+    "signin_token_cache_requests_total", "Token 驗證快取查詢次數", lambda: {
+        ("hit",): token_cache.hits, ("miss",): token_cache.misses
+    }, ("result",))
+metrics.counter_func(
+    "signin_response_cache_requests_total", "已編碼回應快取查詢次數", lambda: {
+        ("hit",): response_cache.hits, ("miss",): response_cache.misses
+    }, ("result",))
+
+def route_label(request: Request) -> str:
+    """請求對應的路由樣板（需在路由比對後呼叫），未對應到路由時為 unmatched"""
+    route = request.scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+def record_commit(seconds: float, size: Optional[int]):
+    """記錄一次提交的寫入時間與位元組數，size 為 None 表示寫入失敗"""
+    if size is None:
+        commit_total.inc("error")
+        return
+    commit_total.inc("ok")
+    commit_duration.observe(seconds)
+    commit_bytes.inc(amount=size)
+
+async def metrics_middleware(request: Request, call_next):
+    """記錄每個路由的請求數與處理時間（最外層，包含等待寫入鎖等中介層的時間）"""
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        path = route_label(request)
+        http_requests.inc(request.method, path, str(status_code))
+        http_duration.observe(time.perf_counter() - start, request.method, path)
+
+# ============== 效能剖析 ==============
+# PROFILING_ENABLED 時：
+# - 每個請求記錄各階段時間（auth 認證、lookup 路由處理、mutation 資料與索引異動、persistence 提交寫入，
+#   其餘為 other），以 Server-Timing 標頭回傳並計入監控指標
+# - 依 PROFILE_SAMPLE_RATE 隨機、或由管理員帶 X-Profile: 1 標頭的請求以 cProfile 剖析，
+#   保留最近 PROFILE_HISTORY 份，回應的 X-Profile-Id 標頭為剖析結果編號
+# cProfile 會記錄剖析期間事件迴圈上執行的所有程式，同時處理的其他請求也會出現在結果中；
+# 同一時間只剖析一個請求，其他請求照常處理
+
+class PhaseTimer:
+    """記錄一個請求在各階段花費的時間，巢狀的階段只計入最內層"""
+
+    def __init__(self):
+        self.totals = {}
+        self.stack = []  # [階段名稱, 開始時間, 內層階段花費的時間]
+        self.next_name = None
+
+    def phase(self, name: str):
+        self.next_name = name
+        return self
+
+    def __enter__(self):
+        self.stack.append([self.next_name, time.perf_counter(), 0.0])
+
+    def __exit__(self, *exc):
+        name, start, inner = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        self.totals[name] = self.totals.get(name, 0.0) + elapsed - inner
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+    def summary(self, total: float) -> dict:
+        phases = dict(self.totals)
+        phases["other"] = max(0.0, total - sum(phases.values()))
+        return phases
+
+request_phases: ContextVar[Optional[PhaseTimer]] = ContextVar("request_phases", default=None)
+NO_PHASE = nullcontext()
+
+def timed_phase(name: str):
+    """計時目前請求的一個階段（未啟用剖析時不做任何事）"""
+    timer = request_phases.get()
+    return NO_PHASE if timer is None else timer.phase(name)
+
+def timed_endpoint(endpoint):
+    """路由函數本身的時間計入 lookup 階段"""
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        with timed_phase("lookup"):
+            return await endpoint(*args, **kwargs)
+    return wrapper
+
+class TimedRoute(APIRoute):
+    """啟用剖析時，以 timed_endpoint() 包裝路由函數"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if PROFILING_ENABLED and asyncio.iscoroutinefunction(endpoint):
+            endpoint = timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+app.router.route_class = TimedRoute
+
+class ProfileStore:
+    """保留最近的剖析結果"""
+
+    def __init__(self, max_size: int):
+        self.entries = OrderedDict()  # 編號 -> 剖析結果
+        self.max_size = max_size
+        self.active = False  # 是否有請求正在剖析
+
+    def add(self, profiler: cProfile.Profile, info: dict) -> str:
+        profile_id = f"profile-{uuid.uuid4().hex[:8]}"
+        profiler.create_stats()
+        self.entries[profile_id] = {"id": profile_id, **info, "stats": profiler.stats}
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        return self.entries.get(profile_id)
+
+    def summaries(self) -> list:
+        return [
+            {k: v for k, v in entry.items() if k != "stats"}
+            for entry in reversed(self.entries.values())
+        ]
+
+class StoredProfile:
+    """讓 pstats.Stats() 讀取已保存的剖析結果"""
+
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+profile_store = ProfileStore(PROFILE_HISTORY)
+phase_duration = metrics.histogram(
+    "signin_request_phase_seconds", "各路由在各處理階段花費的時間（秒，需啟用剖析）", ("route", "phase"))
+
+def request_is_admin(request: Request) -> bool:
+    """檢查請求是否帶有管理員的 Token（不計入認證失敗）"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    payload = token_cache.get(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except jwt.InvalidTokenError:
+            return False
+    user = USERS.get(payload.get("sub"))
+    return user is not None and user.get("role") == UserRole.ADMIN
+
+def should_profile(request: Request) -> bool:
+    if profile_store.active:
+        return False
+    if request.headers.get("x-profile", "").lower() in ("1", "true", "yes"):
+        return request_is_admin(request)
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+async def profiling_middleware(request: Request, call_next):
+    """記錄各階段時間，並剖析抽樣或指定的請求（只在啟用剖析時註冊）"""
+    timer = PhaseTimer()
+    request_phases.set(timer)
+    profiler = None
+    if should_profile(request):
+        profiler = cProfile.Profile()
+        profile_store.active = True
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profile_store.active = False
+    duration = time.perf_counter() - start
+
+    route = route_label(request)
+    phases = timer.summary(duration)
+    for name, seconds in phases.items():
+        phase_duration.observe(seconds, route, name)
+    response.headers["Server-Timing"] = ", ".join(
+        f"{name};dur={seconds * 1000:.3f}" for name, seconds in phases.items()
+    )
+    if profiler is not None:
+        response.headers["X-Profile-Id"] = profile_store.add(profiler, {
+            "method": request.method,
+            "path": request.url.path,
+            "route": route,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 3),
+            "phases_ms": {name: round(seconds * 1000, 3) for name, seconds in phases.items()},
+            "created_at": datetime.now().isoformat()
+        })
+    return response
+
+if PROFILING_ENABLED:
+    app.middleware("http")(profiling_middleware)
+
+# 最後註冊的中介層在最外層：監控指標須在其他中介層之後註冊，處理時間才包含剖析等中介層
+app.middleware("http")(metrics_middleware)
+
+# ============== 即時推送（SSE） ==============
+# 異動路由呼叫 publish() 發出精簡的差異訊息，訊息只序列化一次，再分送給所有連線
+# 訊息編號為 "{BOOT_ID}-{序號}"，斷線重連時依 Last-Event-ID 補發之後的訊息
+
+class EventBroadcaster:
+    def __init__(self, history_size: int):
+        self.sequence = 0
+        self.history = deque(maxlen=history_size)  # (序號, 已格式化的訊息)
+        self.subscribers = set()
+
+    def publish(self, event_type: str, data: dict):
+        self.sequence += 1
+        payload = encode_json(data).decode()
+        message = f"id: {BOOT_ID}-{self.sequence}\nevent: {event_type}\ndata: {payload}\n\n"
+        self.history.append((self.sequence, message))
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # 連線跟不上，中斷讓用戶端以 Last-Event-ID 重連補發
+                self.drop(queue)
+
+    def drop(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def subscribe(self, last_event_id: Optional[str]) -> asyncio.Queue:
+        """建立連線的訊息佇列，並補發 last_event_id 之後的訊息"""
+        queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+        if last_event_id:
+            boot_id, _, sequence = last_event_id.partition("-")
+            missed = None
+            if boot_id == BOOT_ID and sequence.isdigit():
+                last = int(sequence)
+                oldest = self.history[0][0] if self.history else self.sequence + 1
+                if last + 1 >= oldest:
+                    missed = [message for seq, message in self.history if seq > last]
+            if missed is None:
+                # 伺服器已重啟或訊息已過期，通知用戶端重新載入完整資料
+                missed = [f"id: {BOOT_ID}-{self.sequence}\nevent: resync\ndata: {{}}\n\n"]
+            for message in missed[-SSE_QUEUE_SIZE:]:
+                queue.put_nowait(message)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def close(self):
+        """通知所有連線結束（關閉伺服器時）"""
+        for queue in list(self.subscribers):
+            self.drop(queue)
+
+broadcaster = EventBroadcaster(SSE_HISTORY)
+
+def publish(event_type: str, data: dict):
+    """發出即時推送訊息"""
+    broadcaster.publish(event_type, data)
+
+def publish_checkins(event_id: str, records: list):
+    """推送新的簽到記錄與相關人員的最新積分"""
+    if not records:
+        return
+    members = db["members"]
+    publish("checkin", {
+        "event_id": event_id,
+        "records": records,
+        "members": [
+            {"id": r["member_id"], "points": members[r["member_id"]]["points"]}
+            for r in records if r["member_id"] in members
+        ]
+    })
 
 # 載入資料
+# 多工作行程時，載入與資料轉換期間持有寫入鎖，避免多個行程同時轉換
+if shared_lock is not None:
+    shared_lock.acquire_blocking()
 db = load_db()
 
-# 動態產生 users（不儲存到檔案，每次從環境變數讀取）
-def get_users():
-    return {
-        ADMIN_USERNAME: {
-            "id": "user-1",
-            "username": ADMIN_USERNAME,
-            "password_hash": hashlib.sha256(ADMIN_PASSWORD.encode()).hexdigest(),
-            "role": UserRole.ADMIN,
-            "name": "系統管理員"
-        }
+def migrate_member_teams():
+    """舊版資料以團隊名稱關聯人員，轉換為 team_id（找不到同名團隊時自動建立）"""
+    migrated = 0
+    for member in list(db["members"].values()):
+        if "team_id" in member:
+            continue
+        name = member.pop("team", None)
+        member["team_id"] = ensure_team(name) if name else None
+        put_doc("members", member)
+        migrated += 1
+    if migrated:
+        save_db()
+        print(f"已將 {migrated} 位人員的團隊關聯轉換為 team_id")
+
+migrate_member_teams()
+if shared_lock is not None:
+    shared_lock.release()
+
+# users 不儲存到檔案，啟動時從環境變數產生一次
+USERS = {
+    ADMIN_USERNAME: {
+        "id": "user-1",
+        "username": ADMIN_USERNAME,
+        "password_hash": hashlib.sha256(ADMIN_PASSWORD.encode()).hexdigest(),
+        "role": UserRole.ADMIN,
+        "name": "系統管理員"
     }
+}
 
 # 初始化範例資料
 def init_sample_data():
@@ -195,13 +1915,11 @@ def init_sample_data():
     ]
     for team in teams_data:
         team_id = f"team-{uuid.uuid4().hex[:8]}"
-        db["teams"][team_id] = {
+        put_doc("teams", {
             "id": team_id,
             **team,
             "created_at": datetime.now().isoformat()
-        }
-    
-    team_ids = list(db["teams"].keys())
+        })
     
     # 人員
     members_data = [
@@ -216,14 +1934,14 @@ def init_sample_data():
     ]
     for member in members_data:
         member_id = f"member-{uuid.uuid4().hex[:8]}"
-        db["members"][member_id] = {
+        put_doc("members", {
             "id": member_id,
             "name": member["name"],
-            "team": member["team"],
+            "team_id": find_team_id(member["team"]),
             "points": member["points"],
             "email": f"{member['name']}@example.com",
             "created_at": datetime.now().isoformat()
-        }
+        })
     
     # 事件
     events_data = [
@@ -233,7 +1951,7 @@ def init_sample_data():
     ]
     for event in events_data:
         event_id = f"event-{uuid.uuid4().hex[:8]}"
-        db["events"][event_id] = {
+        put_doc("events", {
             "id": event_id,
             "name": event["name"],
             "points": event["points"],
@@ -241,40 +1959,477 @@ def init_sample_data():
             "status": event["status"],
             "description": None,
             "created_at": datetime.now().isoformat()
-        }
+        })
 
 # 如需測試資料，取消下行註解
 # init_sample_data()
 
+# ============== 簽到佇列 ==============
+# 活動開始時大量報到機同時送出單人簽到，逐一處理時每個請求都要各自驗證與提交
+# 改由佇列收集同一時間送達的請求，依事件合併成一批：每批只驗證一次事件、一起檢查重複簽到、
+# 所有事件共用一次提交，再依批次結果回應各請求；佇列已滿時回應 429
+# 多工作行程時寫入須在請求中持有寫入鎖，不使用佇列
+
+class CheckinQueue:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.pending = {}  # event_id -> [(member_ids, future)]
+        self.size = 0
+        self.wake = asyncio.Event()
+        self.stopping = False
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """停止背景工作，並處理剩下的請求"""
+        self.stopping = True
+        self.wake.set()
+        await self.task
+
+    async def submit(self, event_id: str, member_ids: list) -> list:
+        """排入佇列並等待批次處理完成，回傳此請求新增的簽到記錄
+
+        需要等待寫入磁碟時，在批次回應後由各請求自行等待，佇列不因此停下、可繼續處理後續批次。
+        """
+        if self.size >= self.max_size:
+            checkin_rejected.inc()
+            raise HTTPException(
+                status_code=429,
+                detail="簽到請求過多，請稍後再試",
+                headers={"Retry-After": str(CHECKIN_RETRY_AFTER_SECONDS)}
+            )
+        future = asyncio.get_running_loop().create_future()
+        self.pending.setdefault(event_id, []).append((member_ids, future))
+        self.size += 1
+        self.wake.set()
+        records = await future
+        if wait_durable.get() and flusher is not None:
+            with timed_phase("persistence"):
+                await flusher.wait_durable()
+        return records
+
+    async def run(self):
+        while not self.stopping:
+            await self.wake.wait()
+            # 背景寫入已會合併提交，不必再等待；同步寫入時稍等片刻讓更多請求併入同一次提交
+            if CHECKIN_BATCH_WINDOW_MS > 0 and flusher is None and not self.stopping:
+                await asyncio.sleep(CHECKIN_BATCH_WINDOW_MS / 1000)
+            self.wake.clear()
+            await self.process()
+        await self.process()
+
+    async def process(self):
+        batches, self.pending, self.size = self.pending, {}, 0
+        if not batches:
+            return
+        applied = []  # (event_id, 新增的記錄, [(各請求的記錄, future)])
+        for event_id, items in batches.items():
+            checkin_batch_size.observe(len(items))
+            try:
+                results = apply_checkins(event_id, [member_ids for member_ids, _ in items])
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            records = [record for result in results for record in result]
+            applied.append((event_id, records, [
+                (result, future) for result, (_, future) in zip(results, items)
+            ]))
+
+        # 所有事件的異動一起提交
+        with timed_phase("persistence"):
+            if flusher is None:
+                save_db()
+            else:
+                flusher.notify()
+        for event_id, records, items in applied:
+            publish_checkins(event_id, records)
+            for result, future in items:
+                if not future.done():
+                    future.set_result(result)
+
+checkin_queue: Optional[CheckinQueue] = None
+checkin_rejected = metrics.counter(
+    "signin_checkin_queue_rejected_total", "簽到佇列已滿而回應 429 的請求數")
+checkin_batch_size = metrics.histogram(
+    "signin_checkin_batch_requests", "每批合併處理的單人簽到請求數（依事件）",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+metrics.gauge(
+    "signin_checkin_queue_depth", "等待處理的單人簽到請求數",
+    lambda: {(): checkin_queue.size if checkin_queue else 0})
+
 # ============== 工具函數 ==============
 
+def encode_cursor(position) -> str:
+    """將排序位置 (checked_in_at, id) 編碼成游標"""
+    return base64.urlsafe_b64encode(json.dumps(list(position)).encode()).decode()
+
+def decode_cursor(cursor: str):
+    """解析游標；內容須為 [checked_in_at, id] 兩個字串，否則與索引中的位置比較時會出錯"""
+    try:
+        checked_in_at, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(checked_in_at, str) or not isinstance(record_id, str):
+            raise ValueError("cursor 內容須為字串")
+        datetime.fromisoformat(checked_in_at)
+        return (checked_in_at, record_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="無效的 cursor")
+
+def record_positions(event_id: Optional[str], member_id: Optional[str]):
+    """篩選後的簽到記錄排序位置，回傳以 after(position, limit) 依游標取得下一批位置的物件"""
+    if STORAGE_BACKEND == "sqlite":
+        # 篩選與排序都交給資料表的索引，每批查詢一次
+        conditions = {"event_id": event_id, "member_id": member_id}
+        return records_by_time.where(**{column: value for column, value in conditions.items() if value})
+    if event_id and member_id:
+        record_id = attendance_index.get((event_id, member_id))
+        record_ids = [record_id] if record_id else []
+    elif event_id:
+        record_ids = records_by_event.get(event_id)
+    elif member_id:
+        record_ids = records_by_member.get(member_id)
+    else:
+        return records_by_time
+    return PositionList(sorted(records_by_time.position(rid) for rid in record_ids))
+
+def enrich_record(record: dict, with_member: bool = True) -> dict:
+    """加入簽到記錄的事件（與人員）關聯資料"""
+    event = db["events"].get(record["event_id"], {})
+    enriched = {
+        **record,
+        "event_name": event.get("name"),
+        "event_date": event.get("date"),
+        "event_time": event.get("time")
+    }
+    if with_member:
+        member = db["members"].get(record["member_id"], {})
+        enriched["member_name"] = member.get("name")
+        enriched["member_team"] = team_name(member.get("team_id"))
+    return enriched
+
+def page_records(event_id, member_id, after: Optional[str], limit: Optional[int], with_member: bool = True):
+    """依 (checked_in_at, id) 排序取得一頁簽到記錄，回傳 (records, next_cursor)"""
+    positions = record_positions(event_id, member_id)
+    start = decode_cursor(after) if after else None
+    page = positions.after(start, None if limit is None else limit + 1)
+    next_cursor = None
+    if limit is not None and len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1])
+    records = get_docs("checkin_records", (rid for _, rid in page))
+    return [enrich_record(r, with_member) for r in records], next_cursor
+
+def etag_version(collection: str) -> str:
+    """集合在 ETag 中的版本
+
+    多工作行程時使用共用資料庫中該集合的異動序號，各行程對相同的資料產生相同的 ETag；
+    本行程有尚未寫入的異動時改用本行程的版本，不會與其他行程的 ETag 相同。
+    """
+    if shared_lock is None:
+        return str(collection_versions[collection])
+    if committed_versions[collection] != collection_versions[collection]:
+        return f"{BOOT_ID}.{collection_versions[collection]}"
+    return str(store.versions.get(collection, 0))
+
+def make_etag(*collections, variant: str = "") -> str:
+    """依回應所用到的集合版本產生 ETag（variant 為版本以外也會影響內容的值，如預設的日期）"""
+    versions = "-".join(etag_version(c) for c in collections)
+    if variant:
+        versions = f"{versions}-{variant}"
+    prefix = BOOT_ID if shared_lock is None else store.store_id
+    return f'W/"{prefix}-{versions}"'
+
+class ResponseCache:
+    """已編碼回應的 LRU 快取：key 為請求路徑與查詢字串，所用集合的版本改變即失效"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (版本, body)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, versions) -> Optional[bytes]:
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == versions:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, key, versions, body: bytes):
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old[1])
+        if len(body) > self.max_bytes:
+            return
+        self.entries[key] = (versions, body)
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES)
+
+def check_etag(request: Request, response: Response, *collections, variant: str = "") -> Optional[Response]:
+    """用戶端已有最新版本時回傳 304 回應，否則在回應加上 ETag 並回傳 None
+
+    之前以 cache_response() 快取過且資料未異動時，直接回傳快取的內容。
+    """
+    etag = make_etag(*collections, variant=variant)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    key = (request.url.path, request.url.query)
+    versions = tuple(collection_versions[c] for c in collections) + (variant,)
+    request.state.response_cache = (key, versions)
+    body = response_cache.get(key, versions)
+    if body is not None:
+        return Response(body, media_type="application/json", headers=headers)
+    response.headers.update(headers)
+    return None
+
+def cache_response(request: Request, response: Response, content) -> Response:
+    """編碼回應內容，並依 check_etag() 記下的 key 與版本存入快取"""
+    body = encode_json(content)
+    key, versions = request.state.response_cache
+    response_cache.put(key, versions, body)
+    return Response(body, media_type="application/json", headers=dict(response.headers))
+
+def ndjson_line(obj) -> str:
+    return encode_json(obj).decode() + "\n"
+
+async def stream_records(event_id, member_id, position, limit: Optional[int], with_member: bool = True):
+    """以 NDJSON 逐批輸出簽到記錄，每行為 {"record": {...}}
+
+    position 為 decode_cursor() 解析後的起始位置，須在開始回應前解析，無效時才能回應 400。
+    每批都從上一批最後的位置重新定位，輸出期間資料有異動也不會出錯。
+    指定 limit 且還有下一頁時，最後一行為 {"next_cursor": "..."}。
+    """
+    positions = record_positions(event_id, member_id)
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = STREAM_CHUNK_SIZE if remaining is None else min(STREAM_CHUNK_SIZE, remaining)
+        page = positions.after(position, size)
+        if not page:
+            return
+        records = get_docs("checkin_records", (rid for _, rid in page))
+        yield "".join(ndjson_line({"record": enrich_record(r, with_member)}) for r in records)
+        position = page[-1]
+        if remaining is not None:
+            remaining -= len(page)
+        await asyncio.sleep(0)
+    if positions.after(position, 1):
+        yield ndjson_line({"next_cursor": encode_cursor(position)})
+
+# 匯出檔案的欄位（CSV 依此順序輸出）
+EXPORT_FIELDS = {
+    "checkin_records": ["id", "checked_in_at", "event_id", "event_name", "event_date",
+                        "member_id", "member_name", "member_team", "points_awarded"],
+    "members": ["id", "name", "team_id", "team", "email", "points", "created_at", "checkin_count"],
+    "attendance": ["member_id", "member_name", "team", "checked_in", "checked_in_at", "points_awarded"],
+}
+
+def date_range_keys(start_date: Optional[date], end_date: Optional[date]):
+    """將日期區間（含頭尾）轉為 checked_in_at 的比較範圍 [start, end)（end 為 date.max 時不設上限）"""
+    start = start_date.isoformat() if start_date else None
+    end = (end_date + timedelta(days=1)).isoformat() if end_date and end_date < date.max else None
+    return start, end
+
+async def iter_record_range(event_id, member_id, start: Optional[str], end: Optional[str]):
+    """依時間順序逐批取出 checked_in_at 介於 [start, end) 的簽到記錄"""
+    positions = record_positions(event_id, member_id)
+    position = (start, "") if start else None
+    while True:
+        page = positions.after(position, STREAM_CHUNK_SIZE)
+        if end is not None:
+            in_range = [p for p in page if p[0] < end]
+            finished = len(in_range) < len(page)
+            page = in_range
+        else:
+            finished = False
+        if not page:
+            return
+        yield get_docs("checkin_records", (rid for _, rid in page))
+        if finished:
+            return
+        position = page[-1]
+        await asyncio.sleep(0)
+
+def export_chunk(rows: list, format: str, fields: list) -> str:
+    """將一批資料轉為 CSV 或 NDJSON 文字"""
+    if format == "ndjson":
+        return "".join(ndjson_line(row) for row in rows)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    for row in rows:
+        writer.writerow(["" if row.get(field) is None else row.get(field) for field in fields])
+    return out.getvalue()
+
+def export_response(chunks, format: str, kind: str, filename: str) -> StreamingResponse:
+    """以串流回應輸出匯出資料，chunks 為逐批產生 dict 清單的非同步產生器"""
+    fields = EXPORT_FIELDS[kind]
+
+    async def body():
+        if format == "csv":
+            # 加上 BOM，Excel 開啟時才能正確顯示中文
+            yield "\ufeff" + export_chunk([dict(zip(fields, fields))], format, fields)
+        async for rows in chunks:
+            if rows:
+                yield export_chunk(rows, format, fields)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'}
+    )
+
+async def iter_body_lines(request: Request):
+    """逐行讀取請求內容（不會一次載入整個請求），回傳去除換行的文字行"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in request.stream():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+async def iter_import_rows(request: Request, format: str):
+    """將 CSV（第一列為欄位名稱）或 NDJSON 請求內容逐列解析為 (列號, dict 或錯誤訊息)"""
+    header = None
+    pending = ""
+    line_no = 0
+    start = 0
+    async for line in iter_body_lines(request):
+        line_no += 1
+        if format == "ndjson":
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_no, "JSON 格式錯誤"
+                continue
+            yield line_no, row if isinstance(row, dict) else "每行需為 JSON 物件"
+            continue
+        # CSV 欄位可能包含換行，引號未成對時繼續累積下一行
+        if not pending:
+            start = line_no
+        pending = f"{pending}\n{line}" if pending else line
+        if pending.count('"') % 2:
+            continue
+        text, pending = pending, ""
+        if not text.strip():
+            continue
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error:
+            yield start, "CSV 格式錯誤"
+            continue
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+        yield start, {key: value.strip() or None for key, value in zip(header, values)}
+    if pending:
+        yield start, "CSV 引號未閉合"
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=401, detail="無效的認證憑證")
-        return payload
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token 已過期")
-    except jwt.JWTError:
-        raise HTTPException(status_code=401, detail="無效的 Token")
-
-def get_current_user(token_data: dict = Depends(verify_token)):
+class TokenCache:
+    """已驗證 Token 的 LRU 快取，同一個 Token 重複使用時不必再解碼驗證簽章
+
+    以完整的 Token 字串為 key，到 Token 的 exp 時失效。
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries = OrderedDict()  # token -> (payload, exp)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        entry = self.entries.get(token)
+        if entry is not None:
+            payload, exp = entry
+            if exp > time.time():
+                self.entries.move_to_end(token)
+                self.hits += 1
+                return payload
+            del self.entries[token]
+        self.misses += 1
+        return None
+
+    def put(self, token: str, payload: dict):
+        if self.max_size <= 0 or "exp" not in payload:
+            return
+        self.entries[token] = (payload, payload["exp"])
+        self.entries.move_to_end(token)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None
+        }
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
+# 認證相依函數宣告為 async，直接在事件迴圈上執行，不必每個請求都切換到執行緒池
+async def verify_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)):
+    if credentials is None:
+        auth_failures.inc("missing_token")
+        raise HTTPException(status_code=403, detail="Not authenticated")
+    token = credentials.credentials
+    with timed_phase("auth"):
+        payload = token_cache.get(token)
+        if payload is not None:
+            return payload
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            username: str = payload.get("sub")
+            if username is None:
+                auth_failures.inc("invalid_token")
+                raise HTTPException(status_code=401, detail="無效的認證憑證")
+            token_cache.put(token, payload)
+            return payload
+        except jwt.ExpiredSignatureError:
+            auth_failures.inc("expired_token")
+            raise HTTPException(status_code=401, detail="Token 已過期")
+        except jwt.InvalidTokenError:
+            auth_failures.inc("invalid_token")
+            raise HTTPException(status_code=401, detail="無效的 Token")
+
+async def get_current_user(token_data: dict = Depends(verify_token)):
     username = token_data.get("sub")
-    user = get_users().get(username)
+    user = USERS.get(username)
     if not user:
+        auth_failures.inc("unknown_user")
         raise HTTPException(status_code=404, detail="使用者不存在")
     return user
 
-def require_admin(current_user: dict = Depends(get_current_user)):
+async def require_admin(current_user: dict = Depends(get_current_user)):
     if current_user.get("role") != UserRole.ADMIN:
+        auth_failures.inc("forbidden")
         raise HTTPException(status_code=403, detail="需要管理員權限")
     return current_user
 
@@ -284,12 +2439,14 @@ def require_admin(current_user: dict = Depends(get_current_user)):
 @app.post("/api/auth/login", response_model=Token, tags=["認證"])
 async def login(request: LoginRequest):
     """使用者登入"""
-    user = get_users().get(request.username)
+    user = USERS.get(request.username)
     if not user:
+        auth_failures.inc("bad_credentials")
         raise HTTPException(status_code=401, detail="帳號或密碼錯誤")
     
     password_hash = hashlib.sha256(request.password.encode()).hexdigest()
     if user["password_hash"] != password_hash:
+        auth_failures.inc("bad_credentials")
         raise HTTPException(status_code=401, detail="帳號或密碼錯誤")
     
     access_token = create_access_token(
@@ -320,45 +2477,116 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
 
 # ----- 公開 API（不需認證）-----
 @app.get("/api/public/leaderboard", tags=["公開 API"])
-async def get_public_leaderboard():
-    """取得公開排行榜（不需認證）"""
-    members = list(db["members"].values())
-    records = list(db["checkin_records"].values())
-
-    # 加入簽到記錄的關聯資料
-    enriched_records = []
-    for record in records:
-        event = db["events"].get(record["event_id"], {})
-        enriched_records.append({
-            **record,
-            "event_name": event.get("name"),
-            "event_date": event.get("date"),
-            "event_time": event.get("time")
-        })
-
-    return {
-        "members": members,
-        "records": enriched_records
+async def get_public_leaderboard(
+    request: Request,
+    response: Response,
+    limit: int = Query(PUBLIC_PAGE_SIZE, ge=1, le=PUBLIC_PAGE_MAX),
+    after: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """取得公開排行榜（不需認證）
+
+    簽到記錄依 (checked_in_at, id) 排序並一律分頁（limit 預設 PUBLIC_PAGE_SIZE、最多 PUBLIC_PAGE_MAX 筆），
+    以回傳的 next_cursor 作為下一頁的 after。
+    format=ndjson 時以串流逐行輸出 {"member": ...} 與 {"record": ...}。
+    """
+    cached = check_etag(request, response, "members", "teams", "events", "checkin_records")
+    if cached:
+        return cached
+
+    if format == "ndjson":
+        position = decode_cursor(after) if after else None
+
+        async def stream():
+            for member in list(db["members"].values()):
+                yield ndjson_line({"member": render_member(member)})
+            async for chunk in stream_records(None, None, position, limit, with_member=False):
+                yield chunk
+        return StreamingResponse(stream(), media_type="application/x-ndjson", headers=dict(response.headers))
+
+    records, next_cursor = page_records(None, None, after, limit, with_member=False)
+    result = {
+        "members": [render_member(m) for m in db["members"].values()],
+        "records": records,
+        "next_cursor": next_cursor
     }
+    return cache_response(request, response, result)
+
+@app.get("/api/public/stream", tags=["公開 API"])
+async def public_stream(request: Request):
+    """即時推送簽到與積分異動（Server-Sent Events，不需認證）
+
+    訊息類型：checkin、checkin_deleted、points_reset、member、team、event、reset；
+    收到 resync 時表示漏接訊息，用戶端應重新載入完整資料。
+    """
+    queue = broadcaster.subscribe(request.headers.get("last-event-id"))
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # ----- 人員管理 -----
 @app.get("/api/members", tags=["人員管理"])
 async def get_members(
+    request: Request,
+    response: Response,
     team: Optional[str] = None,
+    team_id: Optional[str] = None,
     search: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=0),
     _: dict = Depends(verify_token)
 ):
-    """取得人員列表"""
-    members = list(db["members"].values())
+    """取得人員列表（team 為團隊名稱，也可改用 team_id 篩選）
 
-    if team:
-        members = [m for m in members if m["team"] == team]
+    search 以搜尋索引比對姓名與電子郵件（中文為連續字、英文與數字為單字開頭），結果依符合程度排序；
+    limit 限制回傳筆數，total 仍為全部符合的人數。
+    """
+    cached = check_etag(request, response, "members", "teams")
+    if cached:
+        return cached
 
-    if search:
-        search_lower = search.lower()
-        members = [m for m in members if search_lower in m["name"].lower()]
+    if team and not team_id:
+        team_id = find_team_id(team)
+        if team_id is None:
+            return {"members": [], "total": 0}
 
-    return {"members": members, "total": len(members)}
+    if search:
+        matches = member_search.search(search, members_by_team.get(team_id) if team_id else None)
+        total = len(matches)
+        if limit is not None:
+            matches = heapq.nsmallest(limit, matches)
+        else:
+            matches.sort()
+        members = get_docs("members", (doc_id for _, doc_id in matches))
+    else:
+        if team_id:
+            members = get_docs("members", members_by_team.get(team_id))
+        else:
+            members = list(db["members"].values())
+        total = len(members)
+        if limit is not None:
+            members = members[:limit]
+
+    return cache_response(request, response, {"members": [render_member(m) for m in members], "total": total})
 
 @app.get("/api/members/{member_id}", tags=["人員管理"])
 async def get_member(member_id: str, _: dict = Depends(verify_token)):
@@ -366,7 +2594,17 @@ async def get_member(member_id: str, _: dict = Depends(verify_token)):
     member = db["members"].get(member_id)
     if not member:
         raise HTTPException(status_code=404, detail="人員不存在")
-    return member
+    return render_member(member)
+
+def resolve_member_team(team: Optional[str], team_id: Optional[str]) -> Optional[str]:
+    """將請求中的團隊名稱或 team_id 轉為 team_id（以名稱指定時，找不到會自動建立團隊）"""
+    if team_id:
+        if team_id not in db["teams"]:
+            raise HTTPException(status_code=400, detail="團隊不存在")
+        return team_id
+    if team:
+        return ensure_team(team)
+    return None
 
 @app.post("/api/members", tags=["人員管理"])
 async def create_member(request: MemberCreate, _: dict = Depends(require_admin)):
@@ -375,14 +2613,16 @@ async def create_member(request: MemberCreate, _: dict = Depends(require_admin))
     member = {
         "id": member_id,
         "name": request.name,
-        "team": request.team,
+        "team_id": resolve_member_team(request.team, request.team_id),
         "email": request.email,
         "points": 0,
         "created_at": datetime.now().isoformat()
     }
-    db["members"][member_id] = member
-    save_db()
-    return member
+    put_doc("members", member)
+    await commit()
+    result = render_member(member)
+    publish("member", {"action": "created", "member": result})
+    return result
 
 @app.put("/api/members/{member_id}", tags=["人員管理"])
 async def update_member(
@@ -396,28 +2636,97 @@ async def update_member(
         raise HTTPException(status_code=404, detail="人員不存在")
     
     update_data = request.dict(exclude_unset=True)
+    if "team" in update_data or "team_id" in update_data:
+        update_data["team_id"] = resolve_member_team(update_data.pop("team", None), update_data.get("team_id"))
     member.update(update_data)
-    save_db()
-    return member
+    put_doc("members", member)
+    await commit()
+    result = render_member(member)
+    publish("member", {"action": "updated", "member": result})
+    return result
 
 @app.delete("/api/members/{member_id}", tags=["人員管理"])
 async def delete_member(member_id: str, _: dict = Depends(require_admin)):
     """刪除人員"""
     if member_id not in db["members"]:
         raise HTTPException(status_code=404, detail="人員不存在")
-    del db["members"][member_id]
-    save_db()
+    delete_doc("members", member_id)
+    await commit()
+    publish("member", {"action": "deleted", "member_id": member_id})
     return {"message": "刪除成功"}
 
+@app.post("/api/members/import", tags=["人員管理"])
+async def import_members(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    _: dict = Depends(require_admin)
+):
+    """批量匯入人員
+
+    請求內容為 CSV（第一列為欄位名稱）或 NDJSON，欄位同新增人員：name、team 或 team_id、email。
+    未指定 format 時依 Content-Type 判斷。內容邊讀邊驗證，有錯的列回報於 errors 並略過，
+    其餘人員在讀完後一次寫入；以名稱指定的團隊不存在時自動建立。
+    """
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+
+    rows = []
+    errors = []
+    failed_count = 0
+    async for line_no, row in iter_import_rows(request, format):
+        error = row if isinstance(row, str) else None
+        if error is None:
+            try:
+                member = MemberCreate(**row)
+                if not member.name.strip():
+                    error = "name 不可為空"
+                elif member.team_id and member.team_id not in db["teams"]:
+                    error = "團隊不存在"
+                else:
+                    rows.append(member)
+            except ValidationError as e:
+                error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+        if error is not None:
+            failed_count += 1
+            if len(errors) < IMPORT_MAX_ERRORS:
+                errors.append({"line": line_no, "error": error})
+
+    # 讀取期間不寫入，讀完後一次套用，確保整批在同一次提交中
+    team_count = len(db["teams"])
+    for row in rows:
+        put_doc("members", {
+            "id": f"member-{uuid.uuid4().hex[:8]}",
+            "name": row.name.strip(),
+            "team_id": resolve_member_team(row.team, row.team_id),
+            "email": row.email,
+            "points": 0,
+            "created_at": datetime.now().isoformat()
+        })
+    teams_created = len(db["teams"]) - team_count
+    if rows:
+        await commit()
+        publish("member", {"action": "imported", "count": len(rows)})
+    return {
+        "success": failed_count == 0,
+        "imported_count": len(rows),
+        "failed_count": failed_count,
+        "teams_created": teams_created,
+        "errors": errors
+    }
+
 # ----- 團隊管理 -----
 @app.get("/api/teams", tags=["團隊管理"])
-async def get_teams(_: dict = Depends(verify_token)):
+async def get_teams(request: Request, response: Response, _: dict = Depends(verify_token)):
     """取得團隊列表"""
+    cached = check_etag(request, response, "teams", "members")
+    if cached:
+        return cached
+
     teams = []
     for team in db["teams"].values():
-        member_count = len([m for m in db["members"].values() if m["team"] == team["name"]])
+        member_count = members_by_team.count(team["id"])
         teams.append({**team, "member_count": member_count})
-    return {"teams": teams}
+    return cache_response(request, response, {"teams": teams})
 
 @app.post("/api/teams", tags=["團隊管理"])
 async def create_team(request: TeamCreate, _: dict = Depends(require_admin)):
@@ -429,8 +2738,9 @@ async def create_team(request: TeamCreate, _: dict = Depends(require_admin)):
         "description": request.description,
         "created_at": datetime.now().isoformat()
     }
-    db["teams"][team_id] = team
-    save_db()
+    put_doc("teams", team)
+    await commit()
+    publish("team", {"action": "created", "team": team})
     return team
 
 class TeamUpdate(BaseModel):
@@ -451,14 +2761,11 @@ async def update_team(
     old_name = team["name"]
     update_data = request.dict(exclude_unset=True)
 
-    # 如果改了名稱，也要更新所有成員的 team 欄位
-    if "name" in update_data and update_data["name"] != old_name:
-        for member in db["members"].values():
-            if member["team"] == old_name:
-                member["team"] = update_data["name"]
-
+    # 人員以 team_id 關聯，改名不需更新人員資料
     team.update(update_data)
-    save_db()
+    put_doc("teams", team)
+    await commit()
+    publish("team", {"action": "updated", "team": team, "old_name": old_name})
     return team
 
 @app.delete("/api/teams/{team_id}", tags=["團隊管理"])
@@ -468,30 +2775,35 @@ async def delete_team(team_id: str, _: dict = Depends(require_admin)):
     if not team:
         raise HTTPException(status_code=404, detail="團隊不存在")
 
-    team_name = team["name"]
-
     # 將該團隊的成員設為無部門
-    for member in db["members"].values():
-        if member["team"] == team_name:
-            member["team"] = None
+    for member in get_docs("members", members_by_team.get(team_id)):
+        member["team_id"] = None
+        put_doc("members", member)
 
-    del db["teams"][team_id]
-    save_db()
+    delete_doc("teams", team_id)
+    await commit()
+    publish("team", {"action": "deleted", "team_id": team_id, "name": team["name"]})
     return {"message": "刪除成功"}
 
 # ----- 事件管理 -----
 @app.get("/api/events", tags=["事件管理"])
 async def get_events(
+    request: Request,
+    response: Response,
     status: Optional[EventStatus] = None,
     _: dict = Depends(verify_token)
 ):
     """取得事件列表"""
+    cached = check_etag(request, response, "events")
+    if cached:
+        return cached
+
     events = list(db["events"].values())
     
     if status:
         events = [e for e in events if e["status"] == status]
     
-    return {"events": events}
+    return cache_response(request, response, {"events": events})
 
 @app.get("/api/events/{event_id}", tags=["事件管理"])
 async def get_event(event_id: str, _: dict = Depends(verify_token)):
@@ -515,8 +2827,9 @@ async def create_event(request: EventCreate, _: dict = Depends(require_admin)):
         "description": request.description,
         "created_at": datetime.now().isoformat()
     }
-    db["events"][event_id] = event
-    save_db()
+    put_doc("events", event)
+    await commit()
+    publish("event", {"action": "created", "event": event})
     return event
 
 @app.put("/api/events/{event_id}", tags=["事件管理"])
@@ -532,7 +2845,9 @@ async def update_event(
     
     update_data = request.dict(exclude_unset=True)
     event.update(update_data)
-    save_db()
+    put_doc("events", event)
+    await commit()
+    publish("event", {"action": "updated", "event": event})
     return event
 
 @app.delete("/api/events/{event_id}", tags=["事件管理"])
@@ -540,63 +2855,77 @@ async def delete_event(event_id: str, _: dict = Depends(require_admin)):
     """刪除事件"""
     if event_id not in db["events"]:
         raise HTTPException(status_code=404, detail="事件不存在")
-    del db["events"][event_id]
-    save_db()
+    delete_doc("events", event_id)
+    await commit()
+    publish("event", {"action": "deleted", "event_id": event_id})
     return {"message": "刪除成功"}
 
 @app.post("/api/events/clear-all", tags=["事件管理"])
 async def clear_all_events(_: dict = Depends(require_admin)):
     """清除所有事件"""
     events_count = len(db["events"])
-    db["events"].clear()
-    save_db()
+    clear_collection("events")
+    await commit()
+    publish("event", {"action": "cleared"})
     return {
         "message": "已清除所有事件",
         "events_deleted": events_count
     }
 
 # ----- 簽到 -----
-@app.post("/api/checkin", tags=["簽到"])
-async def single_checkin(request: CheckInRequest, _: dict = Depends(verify_token)):
-    """單人簽到"""
-    event = db["events"].get(request.event_id)
+def apply_checkins(event_id: str, requests: list) -> list:
+    """依序處理同一事件的多個單人簽到請求（各為 member_ids 列表），回傳各請求新增的簽到記錄
+
+    只寫入記憶體，由呼叫端提交；同一批中重複的人員只有第一次有效。
+    """
+    event = db["events"].get(event_id)
     if not event:
         raise HTTPException(status_code=404, detail="事件不存在")
-    
+
     event_status = event["status"].value if isinstance(event["status"], EventStatus) else event["status"]
     if event_status != "active":
         raise HTTPException(status_code=400, detail="此事件無法簽到")
 
     results = []
-    for member_id in request.member_ids:
-        member = db["members"].get(member_id)
-        if not member:
-            continue
-        
-        # 檢查是否已簽到
-        existing = [
-            r for r in db["checkin_records"].values()
-            if r["event_id"] == request.event_id and r["member_id"] == member_id
-        ]
-        if existing:
-            continue
-        
-        # 新增積分
-        member["points"] += event["points"]
-        
-        # 記錄簽到
-        record_id = f"record-{uuid.uuid4().hex[:8]}"
-        record = {
-            "id": record_id,
-            "event_id": request.event_id,
-            "member_id": member_id,
-            "points_awarded": event["points"],
-            "checked_in_at": datetime.now().isoformat()
-        }
-        db["checkin_records"][record_id] = record
-        results.append(record)
+    for member_ids in requests:
+        records = []
+        for member_id in member_ids:
+            member = db["members"].get(member_id)
+            if not member:
+                continue
+
+            # 檢查是否已簽到
+            if has_checked_in(event_id, member_id):
+                checkin_duplicates.inc()
+                continue
+
+            # 新增積分
+            member["points"] += event["points"]
+            put_doc("members", member)
+
+            # 記錄簽到
+            record_id = f"record-{uuid.uuid4().hex[:8]}"
+            record = {
+                "id": record_id,
+                "event_id": event_id,
+                "member_id": member_id,
+                "points_awarded": event["points"],
+                "checked_in_at": datetime.now().isoformat()
+            }
+            add_checkin_record(record)
+            records.append(record)
+        results.append(records)
+    return results
 
-    save_db()
+@app.post("/api/checkin", tags=["簽到"])
+async def single_checkin(request: CheckInRequest, _: dict = Depends(verify_token)):
+    """單人簽到（啟用簽到佇列時與同時送達的簽到合併處理）"""
+    if checkin_queue is not None:
+        results = await checkin_queue.submit(request.event_id, request.member_ids)
+    else:
+        results = apply_checkins(request.event_id, [request.member_ids])[0]
+        await commit()
+        publish_checkins(request.event_id, results)
     return {
         "success": True,
         "checked_in_count": len(results),
@@ -625,16 +2954,14 @@ async def batch_checkin(request: BatchCheckInRequest, _: dict = Depends(verify_t
             continue
         
         # 檢查是否已簽到
-        existing = [
-            r for r in db["checkin_records"].values()
-            if r["event_id"] == request.event_id and r["member_id"] == member_id
-        ]
-        if existing:
+        if has_checked_in(request.event_id, member_id):
+            checkin_duplicates.inc()
             failed_count += 1
             continue
         
         # 新增積分
         member["points"] += event["points"]
+        put_doc("members", member)
         
         # 記錄簽到
         record_id = f"record-{uuid.uuid4().hex[:8]}"
@@ -646,11 +2973,12 @@ async def batch_checkin(request: BatchCheckInRequest, _: dict = Depends(verify_t
             "points_awarded": event["points"],
             "checked_in_at": datetime.now().isoformat()
         }
-        db["checkin_records"][record_id] = record
+        add_checkin_record(record)
         results.append(record)
         success_count += 1
 
-    save_db()
+    await commit()
+    publish_checkins(request.event_id, results)
     return {
         "success": True,
         "event_name": event["name"],
@@ -661,90 +2989,339 @@ async def batch_checkin(request: BatchCheckInRequest, _: dict = Depends(verify_t
         "records": results
     }
 
+def sync_time(value: Optional[datetime], now: datetime) -> str:
+    """報到機的簽到時間轉為伺服器當地時間；未提供或晚於現在時以現在為準"""
+    if value is None:
+        return now.isoformat()
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return min(value, now).isoformat()
+
+@app.post("/api/checkin/sync", tags=["簽到"])
+async def sync_checkins(request: CheckInSyncRequest, _: dict = Depends(verify_token)):
+    """離線同步：報到機恢復連線後一次上傳累積的簽到（可跨多個事件）
+
+    依序處理，全部處理完才提交一次。op_id 已處理過的直接回報 duplicate，整批重送也是安全的。
+    每筆結果的 status：ok、duplicate（op_id 已處理過）、already_checked_in、
+    event_not_found、event_closed、member_not_found；ok 與重複的項目附 record_id。
+    """
+    if len(request.checkins) > SYNC_MAX_OPS:
+        raise HTTPException(status_code=413, detail=f"單次同步最多 {SYNC_MAX_OPS} 筆")
+
+    now = datetime.now()
+    events = {}  # event_id -> 事件（無法簽到時為 None）與狀態
+    results = []
+    records_by_event_id = {}
+    counts = {}
+    for op in request.checkins:
+        result = {"op_id": op.op_id}
+        record_id = records_by_op.get(op.op_id)
+        if record_id:
+            result.update(status="duplicate", record_id=record_id)
+        else:
+            if op.event_id not in events:
+                event = db["events"].get(op.event_id)
+                if not event:
+                    events[op.event_id] = (None, "event_not_found")
+                elif event_status_value(event) != "active":
+                    events[op.event_id] = (None, "event_closed")
+                else:
+                    events[op.event_id] = (event, "ok")
+            event, status = events[op.event_id]
+            member = db["members"].get(op.member_id)
+            if event is None:
+                result["status"] = status
+            elif not member:
+                result["status"] = "member_not_found"
+            elif has_checked_in(op.event_id, op.member_id):
+                checkin_duplicates.inc()
+                result.update(status="already_checked_in",
+                              record_id=attendance_index.get((op.event_id, op.member_id)))
+            else:
+                member["points"] += event["points"]
+                put_doc("members", member)
+                record = {
+                    "id": f"record-{uuid.uuid4().hex[:8]}",
+                    "event_id": op.event_id,
+                    "member_id": op.member_id,
+                    "member_name": member["name"],
+                    "points_awarded": event["points"],
+                    "checked_in_at": sync_time(op.checked_in_at, now),
+                    "client_op_id": op.op_id
+                }
+                add_checkin_record(record)
+                records_by_event_id.setdefault(op.event_id, []).append(record)
+                result.update(status="ok", record_id=record["id"])
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+        results.append(result)
+
+    if records_by_event_id:
+        await commit()
+        for event_id, records in records_by_event_id.items():
+            publish_checkins(event_id, records)
+    return {"counts": counts, "results": results}
+
 # ----- 積分與排行 -----
+def leaderboard_window(window: str, anchor: Optional[date], start_date: Optional[date], end_date: Optional[date]):
+    """排行榜的期間（含頭尾）：week 為 anchor 所在的週（週一起算），month 為所在的月，range 為指定區間"""
+    if window == "range":
+        if start_date and end_date and start_date > end_date:
+            raise HTTPException(status_code=400, detail="start_date 不可晚於 end_date")
+        return start_date, end_date
+    anchor = anchor or date.today()
+    if window == "week":
+        start = anchor - timedelta(days=anchor.weekday())
+        if date.max - start < timedelta(days=6):
+            raise HTTPException(status_code=422, detail="此日期所在的週超出可表示的範圍")
+        return start, start + timedelta(days=6)
+    return anchor.replace(day=1), month_last_day(anchor)
+
+def windowed_leaderboard(start: Optional[date], end: Optional[date], team_id: Optional[str], limit: int) -> list:
+    """依積分分桶加總期間內的積分並排名（不讀取簽到記錄）
+
+    只列出期間內有簽到且目前仍存在的人員；指定團隊時以人員目前所屬的團隊為準。
+    同分時依 created_at、id 排序，與總排行相同。
+    """
+    ranked = []
+    for member_id, (points, count) in points_history.totals(start, end).items():
+        member = db["members"].get(member_id)
+        if member is None or (team_id and member.get("team_id") != team_id):
+            continue
+        ranked.append((-points, member["created_at"], member_id, count, member))
+    leaderboard = []
+    for i, (points, _, _, count, member) in enumerate(heapq.nsmallest(max(limit, 0), ranked), 1):
+        leaderboard.append({
+            "rank": i,
+            **render_member(member),
+            "window_points": -points,
+            "window_checkins": count
+        })
+    return leaderboard
+
 @app.get("/api/leaderboard", tags=["積分排行"])
 async def get_leaderboard(
+    request: Request,
+    response: Response,
     team: Optional[str] = None,
+    team_id: Optional[str] = None,
     limit: int = 50,
+    window: str = Query("all", pattern="^(all|week|month|range)$"),
+    anchor: Optional[date] = Query(None, alias="date"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
     _: dict = Depends(verify_token)
 ):
-    """取得積分排行榜"""
-    members = list(db["members"].values())
-    
-    if team:
-        members = [m for m in members if m["team"] == team]
-    
-    # 按積分排序
-    sorted_members = sorted(members, key=lambda x: x["points"], reverse=True)[:limit]
-    
+    """取得積分排行榜（team 為團隊名稱，也可改用 team_id）
+
+    window=week|month 時依 date（預設今天）所在的週或月的積分排名，window=range 時依
+    start_date～end_date（含頭尾，可只給一邊）排名，由積分分桶計算。
+    """
+    if window == "all":
+        cached = check_etag(request, response, "members", "teams")
+    else:
+        start, end = leaderboard_window(window, anchor, start_date, end_date)
+        # 未指定 date 時期間隨日期改變，須納入快取的版本
+        cached = check_etag(request, response, "members", "teams", "checkin_records",
+                            variant=f"{start}~{end}" if window != "range" and anchor is None else "")
+    if cached:
+        return cached
+
+    if team and not team_id:
+        team_id = find_team_id(team)
+        if team_id is None:
+            return {"leaderboard": []}
+    if window != "all":
+        return cache_response(request, response, {
+            "window": window,
+            "start_date": start.isoformat() if start else None,
+            "end_date": end.isoformat() if end else None,
+            "leaderboard": windowed_leaderboard(start, end, team_id, limit)
+        })
+    if team_id:
+        member_ids = member_ranking.top(limit, team_id)
+    else:
+        member_ids = member_ranking.top(limit)
+
     # 加入排名
     leaderboard = []
-    for i, member in enumerate(sorted_members, 1):
+    for i, member in enumerate(get_docs("members", member_ids), 1):
         leaderboard.append({
             "rank": i,
-            **member
+            **render_member(member)
         })
-    
-    return {"leaderboard": leaderboard}
+
+    return cache_response(request, response, {"leaderboard": leaderboard})
+
+@app.get("/api/leaderboard/rank/{member_id}", tags=["積分排行"])
+async def get_member_rank(
+    member_id: str,
+    within_team: bool = False,
+    around: int = 0,
+    _: dict = Depends(verify_token)
+):
+    """取得人員名次，around > 0 時一併回傳前後各 around 名"""
+    member = db["members"].get(member_id)
+    if not member:
+        raise HTTPException(status_code=404, detail="人員不存在")
+
+    scope = (member.get("team_id"),) if within_team else ()
+    rank = member_ranking.rank(member_id, *scope)
+    neighbours = []
+    if around > 0:
+        start = rank - 1 - around
+        member_ids = member_ranking.window(start, rank + around, *scope)
+        for i, neighbour in enumerate(get_docs("members", member_ids), max(start, 0) + 1):
+            neighbours.append({"rank": i, **render_member(neighbour)})
+
+    return {
+        "member_id": member_id,
+        "rank": rank,
+        "total": len(member_ranking.scope(*scope)),
+        "points": member["points"],
+        "around": neighbours
+    }
+
+def points_history_response(member_ids, granularity: str, start_date: Optional[date], end_date: Optional[date]) -> dict:
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date 不可晚於 end_date")
+    series = points_history.series(member_ids, granularity, start_date, end_date)
+    return {
+        "granularity": granularity,
+        "series": [{"period": period, "points": points, "checkins": count} for period, points, count in series]
+    }
+
+@app.get("/api/members/{member_id}/points-history", tags=["積分排行"])
+async def get_member_points_history(
+    member_id: str,
+    granularity: str = Query("day", pattern="^(day|week|month)$"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    _: dict = Depends(verify_token)
+):
+    """人員的積分時間序列（依日、週或月加總，period 為該期間的起始日或 "YYYY-MM"；只列出有簽到的期間）"""
+    if member_id not in db["members"]:
+        raise HTTPException(status_code=404, detail="人員不存在")
+    return {"member_id": member_id, **points_history_response([member_id], granularity, start_date, end_date)}
+
+@app.get("/api/teams/{team_id}/points-history", tags=["積分排行"])
+async def get_team_points_history(
+    team_id: str,
+    granularity: str = Query("day", pattern="^(day|week|month)$"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    _: dict = Depends(verify_token)
+):
+    """團隊目前成員合計的積分時間序列"""
+    if team_id not in db["teams"]:
+        raise HTTPException(status_code=404, detail="團隊不存在")
+    member_ids = members_by_team.get(team_id)
+    return {"team_id": team_id, **points_history_response(member_ids, granularity, start_date, end_date)}
 
 @app.get("/api/statistics", tags=["統計"])
-async def get_statistics(_: dict = Depends(require_admin)):
-    """取得系統統計資料"""
+async def get_statistics(verify: bool = False, _: dict = Depends(require_admin)):
+    """取得系統統計資料（由累計計數產生；verify=true 時另行完整重算並回報差異）"""
+    team_statistics = {}
+    for key in member_stats.counters:
+        if isinstance(key, tuple) and key[0] == "team_members":
+            team = team_name(key[1])
+            stats = team_statistics.setdefault(team, {"members": 0, "total_points": 0})
+            stats["members"] += member_stats.get(key)
+            stats["total_points"] += member_stats.get(("team_points", key[1]))
+
+    result = {
+        "total_members": member_stats.get("members"),
+        "total_events": event_stats.get("events"),
+        "total_checkins": len(db["checkin_records"]),
+        "total_points_distributed": member_stats.get("points"),
+        "active_events": event_stats.get("active_events"),
+        "team_statistics": team_statistics
+    }
+    if verify:
+        expected = compute_statistics()
+        drift = {
+            key: {"expected": expected[key], "actual": result[key]}
+            for key in expected
+            if key != "team_statistics" and statistic_differs(expected[key], result[key])
+        }
+        # 團隊統計逐一比對，只列出有差異的團隊
+        teams = {
+            team: {"expected": expected["team_statistics"].get(team), "actual": team_statistics.get(team)}
+            for team in expected["team_statistics"].keys() | team_statistics.keys()
+            if statistic_differs(expected["team_statistics"].get(team), team_statistics.get(team))
+        }
+        if teams:
+            drift["team_statistics"] = teams
+        result["drift"] = drift
+    return result
+
+def statistic_differs(expected, actual) -> bool:
+    """比對統計值：數值允許累計加減造成的浮點誤差，dict 逐項比對"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        return expected.keys() != actual.keys() or any(
+            statistic_differs(expected[key], actual[key]) for key in expected
+        )
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        return abs(expected - actual) > 1e-6
+    return expected != actual
+
+def compute_statistics() -> dict:
+    """完整掃描所有資料重算統計（僅供 verify 比對用）"""
     members = list(db["members"].values())
     events = list(db["events"].values())
-    records = list(db["checkin_records"].values())
-    
+
     total_points = sum(m["points"] for m in members)
-    
+
     # 團隊統計
     team_stats = {}
     for member in members:
-        team = member["team"]
+        team = team_name(member.get("team_id"))
         if team not in team_stats:
             team_stats[team] = {"members": 0, "total_points": 0}
         team_stats[team]["members"] += 1
         team_stats[team]["total_points"] += member["points"]
-    
+
     return {
         "total_members": len(members),
         "total_events": len(events),
-        "total_checkins": len(records),
+        "total_checkins": sum(1 for _ in db["checkin_records"]),
         "total_points_distributed": total_points,
-        "active_events": len([e for e in events if (e["status"].value if isinstance(e["status"], EventStatus) else e["status"]) == "active"]),
+        "active_events": len([e for e in events if event_status_value(e) == "active"]),
         "team_statistics": team_stats
     }
 
 # ----- 簽到記錄 -----
 @app.get("/api/checkin-records", tags=["簽到記錄"])
 async def get_checkin_records(
+    request: Request,
+    response: Response,
     event_id: Optional[str] = None,
     member_id: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     _: dict = Depends(verify_token)
 ):
-    """取得簽到記錄"""
-    records = list(db["checkin_records"].values())
-    
-    if event_id:
-        records = [r for r in records if r["event_id"] == event_id]
-    
-    if member_id:
-        records = [r for r in records if r["member_id"] == member_id]
-    
-    # 加入關聯資料
-    enriched_records = []
-    for record in records:
-        event = db["events"].get(record["event_id"], {})
-        member = db["members"].get(record["member_id"], {})
-        enriched_records.append({
-            **record,
-            "event_name": event.get("name"),
-            "event_date": event.get("date"),
-            "event_time": event.get("time"),
-            "member_name": member.get("name"),
-            "member_team": member.get("team")
-        })
-
-    return {"records": enriched_records}
+    """取得簽到記錄
+
+    依 (checked_in_at, id) 排序；指定 limit 時分頁，以回傳的 next_cursor 作為下一頁的 after。
+    format=ndjson 時以串流逐行輸出 {"record": ...}。
+    """
+    cached = check_etag(request, response, "members", "teams", "events", "checkin_records")
+    if cached:
+        return cached
+
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_records(event_id, member_id, decode_cursor(after) if after else None, limit),
+            media_type="application/x-ndjson",
+            headers=dict(response.headers)
+        )
+
+    records, next_cursor = page_records(event_id, member_id, after, limit)
+    result = {"records": records}
+    if limit is not None:
+        result["next_cursor"] = next_cursor
+    return cache_response(request, response, result)
 
 @app.delete("/api/checkin-records/{record_id}", tags=["簽到記錄"])
 async def delete_checkin_record(record_id: str, _: dict = Depends(require_admin)):
@@ -757,10 +3334,17 @@ async def delete_checkin_record(record_id: str, _: dict = Depends(require_admin)
     member = db["members"].get(record["member_id"])
     if member:
         member["points"] = max(0, member["points"] - record["points_awarded"])
+        put_doc("members", member)
 
     # 刪除記錄
-    del db["checkin_records"][record_id]
-    save_db()
+    remove_checkin_record(record_id)
+    await commit()
+    publish("checkin_deleted", {
+        "record_id": record_id,
+        "event_id": record["event_id"],
+        "member_id": record["member_id"],
+        "points": member["points"] if member else None
+    })
 
     return {
         "message": "刪除成功",
@@ -778,12 +3362,14 @@ async def reset_all_points(_: dict = Depends(require_admin)):
     for member in db["members"].values():
         total_points_cleared += member["points"]
         member["points"] = 0
+        put_doc("members", member)
         count += 1
 
     # 清空所有簽到記錄
     records_cleared = len(db["checkin_records"])
-    db["checkin_records"].clear()
-    save_db()
+    clear_checkin_records()
+    await commit()
+    publish("points_reset", {"member_id": None})
 
     return {
         "message": "已清空所有積分",
@@ -800,11 +3386,12 @@ async def reset_all_data(_: dict = Depends(require_admin)):
     events_count = len(db["events"])
     records_count = len(db["checkin_records"])
 
-    db["members"].clear()
-    db["teams"].clear()
-    db["events"].clear()
-    db["checkin_records"].clear()
-    save_db()
+    clear_collection("members")
+    clear_collection("teams")
+    clear_collection("events")
+    clear_checkin_records()
+    await commit()
+    publish("reset", {})
 
     return {
         "message": "已清空所有資料",
@@ -814,6 +3401,70 @@ async def reset_all_data(_: dict = Depends(require_admin)):
         "records_deleted": records_count
     }
 
+@app.get("/api/system/token-cache", tags=["系統管理"])
+async def get_token_cache_stats(_: dict = Depends(require_admin)):
+    """Token 驗證快取的命中統計"""
+    return token_cache.stats()
+
+@app.get("/api/system/response-cache", tags=["系統管理"])
+async def get_response_cache_stats(_: dict = Depends(require_admin)):
+    """已編碼回應快取的使用量與命中統計"""
+    total = response_cache.hits + response_cache.misses
+    return {
+        "entries": len(response_cache.entries),
+        "bytes": response_cache.size,
+        "max_bytes": response_cache.max_bytes,
+        "hits": response_cache.hits,
+        "misses": response_cache.misses,
+        "hit_rate": round(response_cache.hits / total, 4) if total else None,
+        "encoder": "orjson" if orjson is not None else "json"
+    }
+
+# ----- 效能剖析 -----
+@app.get("/api/system/profiles", tags=["系統管理"])
+async def list_profiles(_: dict = Depends(require_admin)):
+    """最近的剖析結果（新的在前）"""
+    return {
+        "enabled": PROFILING_ENABLED,
+        "sample_rate": PROFILE_SAMPLE_RATE,
+        "profiles": profile_store.summaries()
+    }
+
+@app.get("/api/system/profiles/{profile_id}", tags=["系統管理"])
+async def download_profile(
+    profile_id: str,
+    format: str = Query("pstats", pattern="^(pstats|text)$"),
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|ncalls)$"),
+    limit: int = Query(50, ge=1, le=1000),
+    _: dict = Depends(require_admin)
+):
+    """下載剖析結果
+
+    format=pstats（預設）為 pstats 格式的 .prof 檔，可用 python -m pstats 或 snakeviz 開啟；
+    format=text 為依 sort 排序的前 limit 個函數。
+    """
+    entry = profile_store.get(profile_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="剖析結果不存在")
+    if format == "pstats":
+        return Response(
+            content=marshal.dumps(entry["stats"]),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'}
+        )
+    output = io.StringIO()
+    pstats.Stats(StoredProfile(entry["stats"]), stream=output).sort_stats(sort).print_stats(limit)
+    return Response(content=output.getvalue(), media_type="text/plain")
+
+# ----- 監控指標 -----
+@app.get("/metrics", tags=["系統管理"], include_in_schema=False)
+async def get_metrics():
+    """Prometheus 文字格式的監控指標（不需認證，請勿對外公開此路徑）"""
+    return Response(
+        content=metrics.render(),
+        media_type="text/plain; version=0.0.4"
+    )
+
 @app.delete("/api/members/{member_id}/points", tags=["積分管理"])
 async def clear_member_points(member_id: str, _: dict = Depends(require_admin)):
     """清空單一人員積分"""
@@ -823,15 +3474,14 @@ async def clear_member_points(member_id: str, _: dict = Depends(require_admin)):
 
     points_cleared = member["points"]
     member["points"] = 0
+    put_doc("members", member)
 
     # 刪除該人員的簽到記錄
-    records_to_delete = [
-        rid for rid, r in db["checkin_records"].items()
-        if r["member_id"] == member_id
-    ]
+    records_to_delete = records_by_member.get(member_id)
     for rid in records_to_delete:
-        del db["checkin_records"][rid]
-    save_db()
+        remove_checkin_record(rid)
+    await commit()
+    publish("points_reset", {"member_id": member_id, "record_ids": records_to_delete})
 
     return {
         "message": "已清空積分",
@@ -839,7 +3489,194 @@ async def clear_member_points(member_id: str, _: dict = Depends(require_admin)):
         "records_deleted": len(records_to_delete)
     }
 
+# ----- 資料匯出 -----
+# 以串流逐批輸出，不會一次組出完整清單；輸出期間資料有異動也能繼續
+
+def resolve_team_filter(team: Optional[str], team_id: Optional[str]):
+    """匯出的團隊篩選：回傳 team_id，未篩選時回傳 _MISSING"""
+    if not team and not team_id:
+        return _MISSING
+    team_id = team_id or find_team_id(team)
+    if team_id not in db["teams"]:
+        raise HTTPException(status_code=404, detail="團隊不存在")
+    return team_id
+
+@app.get("/api/export/checkin-records", tags=["資料匯出"])
+async def export_checkin_records(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    event_id: Optional[str] = None,
+    member_id: Optional[str] = None,
+    team: Optional[str] = None,
+    team_id: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    _: dict = Depends(verify_token)
+):
+    """匯出簽到記錄（依簽到時間排序，附事件與人員資料；日期區間含頭尾）"""
+    team_filter = resolve_team_filter(team, team_id)
+    start, end = date_range_keys(start_date, end_date)
+
+    async def chunks():
+        async for records in iter_record_range(event_id, member_id, start, end):
+            rows = []
+            for record in records:
+                if team_filter is not _MISSING:
+                    member = db["members"].get(record["member_id"], {})
+                    if member.get("team_id") != team_filter:
+                        continue
+                rows.append(enrich_record(record))
+            yield rows
+
+    return export_response(chunks(), format, "checkin_records", "checkin-records")
+
+@app.get("/api/export/members", tags=["資料匯出"])
+async def export_members(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    team: Optional[str] = None,
+    team_id: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    _: dict = Depends(verify_token)
+):
+    """匯出人員與積分
+
+    指定日期區間時，points 與 checkin_count 改為區間內簽到所得的積分與次數。
+    """
+    team_filter = resolve_team_filter(team, team_id)
+    if team_filter is _MISSING:
+        member_ids = list(db["members"])
+    else:
+        member_ids = members_by_team.get(team_filter)
+
+    async def chunks():
+        in_range = None
+        if start_date or end_date:
+            start, end = date_range_keys(start_date, end_date)
+            records = db["checkin_records"]
+            if isinstance(records, CheckinRecordStore):
+                # 欄位式儲存直接逐欄加總
+                in_range = records.member_totals(start, end)
+            else:
+                # 區間內的積分需先掃過該時段的簽到記錄（只保留每位人員的加總）
+                in_range = {}
+                async for records in iter_record_range(None, None, start, end):
+                    for record in records:
+                        totals = in_range.setdefault(record["member_id"], [0, 0])
+                        totals[0] += record.get("points_awarded") or 0
+                        totals[1] += 1
+        for i in range(0, len(member_ids), STREAM_CHUNK_SIZE):
+            rows = []
+            for member in get_docs("members", member_ids[i:i + STREAM_CHUNK_SIZE]):
+                row = render_member(member)
+                if in_range is None:
+                    row["checkin_count"] = len(records_by_member.get(member["id"]))
+                else:
+                    row["points"], row["checkin_count"] = in_range.get(member["id"], (0, 0))
+                rows.append(row)
+            yield rows
+            await asyncio.sleep(0)
+
+    return export_response(chunks(), format, "members", "members")
+
+@app.get("/api/export/events/{event_id}/attendance", tags=["資料匯出"])
+async def export_event_attendance(
+    event_id: str,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    team: Optional[str] = None,
+    team_id: Optional[str] = None,
+    checked_in: Optional[bool] = None,
+    _: dict = Depends(verify_token)
+):
+    """匯出單一事件的出席名單（每位人員一列，checked_in 可只列出已簽到或未簽到者）"""
+    if event_id not in db["events"]:
+        raise HTTPException(status_code=404, detail="事件不存在")
+    team_filter = resolve_team_filter(team, team_id)
+    if team_filter is _MISSING:
+        member_ids = list(db["members"])
+    else:
+        member_ids = members_by_team.get(team_filter)
+
+    async def chunks():
+        for i in range(0, len(member_ids), STREAM_CHUNK_SIZE):
+            rows = []
+            for member in get_docs("members", member_ids[i:i + STREAM_CHUNK_SIZE]):
+                record_id = attendance_index.get((event_id, member["id"]))
+                if checked_in is not None and bool(record_id) != checked_in:
+                    continue
+                record = db["checkin_records"].get(record_id, {}) if record_id else {}
+                rows.append({
+                    "member_id": member["id"],
+                    "member_name": member["name"],
+                    "team": team_name(member.get("team_id")),
+                    "checked_in": bool(record_id),
+                    "checked_in_at": record.get("checked_in_at"),
+                    "points_awarded": record.get("points_awarded")
+                })
+            yield rows
+            await asyncio.sleep(0)
+
+    return export_response(chunks(), format, "attendance", f"attendance-{event_id}")
+
 # ============== 啟動設定 ==============
+sync_task = None
+
+async def on_startup():
+    global flusher, sync_task, checkin_queue
+    if WORKERS > 1:
+        # 多工作行程時寫入請求等到寫入完成才釋放寫入鎖，背景工作只把同時持有鎖的請求合併成一次提交
+        flusher = GroupCommitFlusher(None)
+        flusher.start()
+        sync_task = asyncio.create_task(sync_periodically())
+        return
+    if FLUSH_INTERVAL_MS > 0:
+        flusher = GroupCommitFlusher(FLUSH_INTERVAL_MS / 1000)
+        flusher.start()
+    if CHECKIN_QUEUE_SIZE > 0:
+        checkin_queue = CheckinQueue(CHECKIN_QUEUE_SIZE)
+        checkin_queue.start()
+
+async def on_shutdown():
+    global flusher, checkin_queue
+    if checkin_queue is not None:
+        # 之後送達的簽到直接處理
+        queue, checkin_queue = checkin_queue, None
+        await queue.stop()
+    broadcaster.close()
+    if sync_task is not None:
+        sync_task.cancel()
+    if flusher is not None:
+        await flusher.stop()
+        flusher = None
+    save_db()
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    import sys
+    if sys.argv[1:2] == ["migrate-sqlite"]:
+        # 一次性將 db.json（含未壓縮的日誌）匯入 SQLITE_FILE
+        from sqlite_store import import_data
+        counts = import_data(load_json_db(), SQLITE_FILE, force="--force" in sys.argv)
+        print(f"已匯入 {SQLITE_FILE}: {counts}")
+    elif sys.argv[1:2] == ["convert-snapshot"] and sys.argv[2:3] in (["json"], ["binary"]):
+        # 將目前的資料（含未壓縮的日誌）另存為指定格式的快照
+        import binary_snapshot
+        data = load_json_db()
+        if sys.argv[2] == "binary":
+            binary_snapshot.write(data, BINARY_FILE)
+            print(f"已轉換為 {BINARY_FILE}")
+        else:
+            SNAPSHOT_FORMAT = "json"
+            write_snapshot(data)
+            print(f"已轉換為 {DATA_FILE}")
+    elif sys.argv[1:2] == ["bench-snapshot"]:
+        # 以目前的資料比較兩種快照格式的載入時間（含重建索引的啟動時間）
+        import binary_snapshot
+        import tempfile
+        with tempfile.TemporaryDirectory() as directory:
+            result = binary_snapshot.benchmark(load_json_db(), directory, prepare=rebuild_indexes)
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        import uvicorn
+        if WORKERS > 1:
+            uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WORKERS)
+        else:
+            uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,299 @@
+"""
+欄位式簽到記錄
+=====================================
+將簽到記錄依欄位存成陣列，取代每筆一個 dict，大量記錄時記憶體用量少得多。
+
+- event_id、member_id、member_name 轉成整數代碼（同一個字串只存一次）
+- points_awarded 存為 float 陣列，checked_in_at 存為微秒數（int64 陣列）
+- 無法放入欄位的值（其他欄位、非預期的型別或時間格式）另存於 extras，取出時原樣還原
+- 以 dict 介面存取，store[record_id] 每次回傳依欄位組成的新 dict（修改它不會影響已存的資料，
+  異動後需重新寫回）
+- 統計類查詢直接逐欄掃描陣列，不必組出每筆記錄
+
+刪除的記錄只標記為已刪除，累積超過一半時才重新整理陣列。
+"""
+
+from array import array
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from typing import Optional
+
+FIELDS = frozenset(("id", "event_id", "member_id", "member_name", "points_awarded", "checked_in_at"))
+EPOCH = datetime(1970, 1, 1)
+NO_TIME = -(2 ** 63)  # checked_in_at 不在欄位中
+NO_POINTS = float("nan")  # points_awarded 不在欄位中
+COMPACT_MIN_DELETED = 1024
+
+
+def time_key(value: str) -> int:
+    """ISO 時間（或日期）字串轉成微秒數，用於比較"""
+    delta = datetime.fromisoformat(value) - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def encode_time(value) -> Optional[int]:
+    """checked_in_at 轉成微秒數；只接受 isoformat() 的輸出格式（無時區，能原樣還原），否則回傳 None"""
+    if type(value) is not str:
+        return None
+    size = len(value)
+    if not ((size == 19 or (size == 26 and value[19] == "."))
+            and value[10] == "T" and value[4] == value[7] == "-" and value[13] == value[16] == ":"):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if size == 26 and not parsed.microsecond:
+        return None
+    delta = parsed - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def decode_time(value: int) -> str:
+    return (EPOCH + timedelta(microseconds=value)).isoformat()
+
+
+class Interner:
+    """字串與整數代碼的對照（只增不減）"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class CheckinRecordStore(MutableMapping):
+    cached = True  # 資料全在記憶體中（rebuild_indexes 依此一次建立索引）
+
+    def __init__(self, docs=None):
+        self.rows = {}  # record id -> 列號
+        self.ids = []  # 列號 -> record id（已刪除為 None）
+        self.event = array("l")
+        self.member = array("l")  # 已刪除為 -1
+        self.name = array("l")
+        self.points = array("d")
+        self.time = array("q")
+        self.extras = {}  # 列號 -> 無法放入欄位的值
+        self.events = Interner()
+        self.members = Interner()
+        self.names = Interner()
+        self.deleted = 0
+        if docs:
+            self.update(docs)
+
+    @staticmethod
+    def _intern(interner: Interner, doc: dict, field: str, extra: dict) -> int:
+        value = doc.get(field)
+        if type(value) is str:
+            return interner.code(value)
+        if field in doc:
+            extra[field] = value
+        return -1
+
+    def __setitem__(self, key: str, doc: dict):
+        unknown = doc.keys() - FIELDS
+        extra = {field: doc[field] for field in unknown} if unknown else {}
+        if doc.get("id", key) != key:
+            extra["id"] = doc["id"]
+        event = self._intern(self.events, doc, "event_id", extra)
+        member = self._intern(self.members, doc, "member_id", extra)
+        name = self._intern(self.names, doc, "member_name", extra)
+        points = doc.get("points_awarded")
+        if type(points) is not float:
+            if "points_awarded" in doc:
+                extra["points_awarded"] = points
+            points = NO_POINTS
+        checked_in_at = encode_time(doc.get("checked_in_at"))
+        if checked_in_at is None:
+            if "checked_in_at" in doc:
+                extra["checked_in_at"] = doc["checked_in_at"]
+            checked_in_at = NO_TIME
+
+        row = self.rows.get(key)
+        if row is None:
+            row = self.rows[key] = len(self.ids)
+            self.ids.append(key)
+            self.event.append(event)
+            self.member.append(member)
+            self.name.append(name)
+            self.points.append(points)
+            self.time.append(checked_in_at)
+        else:
+            self.event[row] = event
+            self.member[row] = member
+            self.name[row] = name
+            self.points[row] = points
+            self.time[row] = checked_in_at
+        if extra:
+            self.extras[row] = extra
+        else:
+            self.extras.pop(row, None)
+
+    def load(self, docs: dict):
+        """整批載入（啟動時使用）
+
+        同時把各筆資料的 id、event_id、member_id、member_name 換成與欄位共用的字串物件，
+        載入後若先以這些 dict 建立索引，索引的 key 不會各自保留一份相同的字串。
+        """
+        rows, ids = self.rows, self.ids
+        events, members, names = self.events, self.members, self.names
+        for key, doc in docs.items():
+            event_id = doc.get("event_id")
+            member_id = doc.get("member_id")
+            member_name = doc.get("member_name")
+            points = doc.get("points_awarded")
+            checked_in_at = encode_time(doc.get("checked_in_at"))
+            if (key in rows or doc.get("id") != key or not doc.keys() <= FIELDS
+                    or type(event_id) is not str or type(member_id) is not str or type(points) is not float
+                    or checked_in_at is None or (member_name is not None and type(member_name) is not str)):
+                # 非預期的格式逐筆處理
+                self[key] = doc
+                continue
+            event = events.codes.get(event_id)
+            if event is None:
+                event = events.code(event_id)
+            member = members.codes.get(member_id)
+            if member is None:
+                member = members.code(member_id)
+            doc["id"] = key
+            doc["event_id"] = events.values[event]
+            doc["member_id"] = members.values[member]
+            if member_name is None:
+                name = -1
+                if "member_name" in doc:
+                    self.extras[len(ids)] = {"member_name": None}
+            else:
+                name = names.codes.get(member_name)
+                if name is None:
+                    name = names.code(member_name)
+                doc["member_name"] = names.values[name]
+            rows[key] = len(ids)
+            ids.append(key)
+            self.event.append(event)
+            self.member.append(member)
+            self.name.append(name)
+            self.points.append(points)
+            self.time.append(checked_in_at)
+
+    def _decode(self, row: int) -> dict:
+        doc = {"id": self.ids[row]}
+        code = self.event[row]
+        if code >= 0:
+            doc["event_id"] = self.events.values[code]
+        code = self.member[row]
+        if code >= 0:
+            doc["member_id"] = self.members.values[code]
+        code = self.name[row]
+        if code >= 0:
+            doc["member_name"] = self.names.values[code]
+        points = self.points[row]
+        if points == points:  # NaN 表示不在欄位中
+            doc["points_awarded"] = points
+        checked_in_at = self.time[row]
+        if checked_in_at != NO_TIME:
+            doc["checked_in_at"] = decode_time(checked_in_at)
+        extra = self.extras.get(row)
+        if extra:
+            doc.update(extra)
+        return doc
+
+    def __getitem__(self, key: str) -> dict:
+        return self._decode(self.rows[key])
+
+    def __delitem__(self, key: str):
+        row = self.rows.pop(key)
+        self.ids[row] = None
+        self.event[row] = self.member[row] = self.name[row] = -1
+        self.points[row] = NO_POINTS
+        self.time[row] = NO_TIME
+        self.extras.pop(row, None)
+        self.deleted += 1
+        if self.deleted >= COMPACT_MIN_DELETED and self.deleted * 2 > len(self.ids):
+            self._compact()
+
+    def _compact(self):
+        """移除已刪除的列"""
+        keep = [row for row, key in enumerate(self.ids) if key is not None]
+        self.ids = [self.ids[row] for row in keep]
+        self.rows = {key: row for row, key in enumerate(self.ids)}
+        for column in ("event", "member", "name", "points", "time"):
+            old = getattr(self, column)
+            setattr(self, column, array(old.typecode, [old[row] for row in keep]))
+        moved = {old: new for new, old in enumerate(keep)}
+        self.extras = {moved[row]: extra for row, extra in self.extras.items()}
+        self.deleted = 0
+
+    def __contains__(self, key) -> bool:
+        return key in self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def items(self):
+        """依寫入順序逐筆組出 (record id, dict)，不必再以 key 查列號"""
+        return ((key, self._decode(row)) for key, row in self.rows.items())
+
+    def values(self):
+        return (self._decode(row) for row in self.rows.values())
+
+    def clear(self):
+        self.__init__()
+
+    def copy(self) -> "CheckinRecordStore":
+        """複製一份供其他執行緒序列化（陣列直接複製，不必組出每筆記錄）
+
+        字串代碼表只會往後新增，與原本的共用即可。
+        """
+        other = CheckinRecordStore.__new__(CheckinRecordStore)
+        other.rows = dict(self.rows)
+        other.ids = list(self.ids)
+        for column in ("event", "member", "name", "points", "time"):
+            setattr(other, column, array(getattr(self, column).typecode, getattr(self, column)))
+        other.extras = dict(self.extras)
+        other.events = self.events
+        other.members = self.members
+        other.names = self.names
+        other.deleted = self.deleted
+        return other
+
+    def member_totals(self, start: Optional[str] = None, end: Optional[str] = None) -> dict:
+        """依人員加總簽到積分與次數，回傳 {member_id: [積分, 次數]}
+
+        start、end 為 checked_in_at 的範圍 [start, end)（ISO 時間或日期字串）。
+        """
+        low = time_key(start) if start else NO_TIME
+        high = time_key(end) if end is not None else 2 ** 63 - 1
+        points_by_code = [0.0] * len(self.members.values)
+        counts_by_code = [0] * len(self.members.values)
+        # 逐欄掃描，跳過已刪除（member 為 -1）與需由 extras 還原的列
+        for member, points, checked_in_at in zip(self.member, self.points, self.time):
+            if member < 0 or points != points or checked_in_at == NO_TIME:
+                continue
+            if low <= checked_in_at < high:
+                points_by_code[member] += points
+                counts_by_code[member] += 1
+        totals = {
+            self.members.values[code]: [points_by_code[code], count]
+            for code, count in enumerate(counts_by_code) if count
+        }
+        # 少數非預期格式的列逐筆還原後比較
+        for row in self.extras:
+            if self.member[row] >= 0 and self.points[row] == self.points[row] and self.time[row] != NO_TIME:
+                continue  # 已在上面計入
+            doc = self._decode(row)
+            checked_in_at = doc.get("checked_in_at") or ""
+            if "member_id" not in doc or (start and checked_in_at < start) or (end is not None and checked_in_at >= end):
+                continue
+            entry = totals.setdefault(doc["member_id"], [0, 0])
+            entry[0] += doc.get("points_awarded") or 0
+            entry[1] += 1
+        return totals
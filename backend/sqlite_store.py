@@ -0,0 +1,545 @@
+"""
+SQLite 儲存引擎
+=====================================
+將 members、teams、events、checkin_records 存在 SQLite 資料表中，
+每張表除了完整資料（doc 欄位）外，另拆出常用欄位。
+
+- 人員、團隊、事件數量不大，啟動時整批載入記憶體，以記憶體索引查詢
+- 簽到記錄只在需要時從資料庫讀取，尚未寫入的異動暫存在記憶體中；
+  重複簽到檢查、依人員／事件篩選、依時間排序的分頁與期間積分都以資料表的索引查詢（見 INDEXES），
+  啟動時不必讀取簽到記錄，記憶體用量不隨簽到歷史增加
+- 對外提供與 dict 相同的介面，路由不需要知道資料存在哪裡
+- 多個工作行程共用時，每次寫入另記錄於 changes 表，其他行程據此更新自己的快取
+"""
+
+from collections.abc import MutableMapping
+from enum import Enum
+from typing import Optional
+import sqlite3
+import json
+import os
+
+# 每張表拆出的欄位（完整資料存於 doc 欄位）
+SCHEMA = {
+    "members": ["name", "team_id", "points"],
+    "teams": ["name"],
+    "events": ["status", "date"],
+    "checkin_records": ["event_id", "member_id", "checked_in_at", "points_awarded", "client_op_id"],
+}
+
+# 簽到記錄查詢所用的索引（快取表以記憶體索引查詢，不另建索引）
+INDEXES = [
+    # 重複簽到檢查
+    "CREATE INDEX IF NOT EXISTS idx_records_attendance ON checkin_records(event_id, member_id)",
+    # 依事件、人員篩選並依時間排序的分頁，人員的積分時間序列
+    "CREATE INDEX IF NOT EXISTS idx_records_event_time ON checkin_records(event_id, checked_in_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_records_member_time ON checkin_records(member_id, checked_in_at, id)",
+    # 依時間排序的分頁、期間排行榜
+    "CREATE INDEX IF NOT EXISTS idx_records_time ON checkin_records(checked_in_at, id)",
+    # 離線同步的操作編號
+    "CREATE INDEX IF NOT EXISTS idx_records_op ON checkin_records(client_op_id) WHERE client_op_id IS NOT NULL",
+]
+# 舊版建立、查詢已不會用到的索引
+OBSOLETE_INDEXES = ["idx_members_team", "idx_members_points", "idx_teams_name", "idx_events_status",
+                    "idx_records_member"]
+
+SQL_MAX_PARAMS = 500  # 以 IN (...) 一次查詢多筆時，每次最多的參數數
+
+# 異動紀錄（多工作行程時使用），seq 遞增，op 為 put / del / clear
+CHANGES_TABLE = (
+    "CREATE TABLE IF NOT EXISTS changes ("
+    "seq INTEGER PRIMARY KEY AUTOINCREMENT, op TEXT NOT NULL, collection TEXT NOT NULL, doc_id TEXT)"
+)
+CHANGES_KEEP = 10000  # 保留最近幾筆異動紀錄，落後更多的行程改為整批重新載入
+# 各集合最後一次異動的 seq（不隨 changes 表清除），各行程據此對相同的資料產生相同的 ETag
+VERSIONS_TABLE = "CREATE TABLE IF NOT EXISTS versions (collection TEXT PRIMARY KEY, seq INTEGER NOT NULL)"
+# 資料庫的識別碼，換成另一個資料庫檔案時 ETag 不會與之前的相同
+META_TABLE = "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+
+# 整張表常駐記憶體的資料表
+CACHED_TABLES = {"members", "teams", "events"}
+
+# 非快取表中代表「已刪除但尚未寫入」的標記
+DELETED = object()
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """開啟資料庫連線並確保資料表存在"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=FULL")
+    # 多個工作行程同時啟動時，依序建立資料表與索引
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for table, columns in SCHEMA.items():
+            column_defs = ", ".join(columns)
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, {column_defs}, doc TEXT NOT NULL)"
+            )
+            # 舊版資料庫缺少的欄位，從 doc 補上既有資料列的值
+            existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for column in columns:
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+                    conn.execute(f"UPDATE {table} SET {column} = json_extract(doc, '$.{column}')")
+        conn.execute(CHANGES_TABLE)
+        conn.execute(VERSIONS_TABLE)
+        conn.execute(META_TABLE)
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('store_id', lower(hex(randomblob(4))))")
+        for name in OBSOLETE_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        for sql in INDEXES:
+            conn.execute(sql)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return conn
+
+
+def column_value(value):
+    """轉成 SQLite 可接受的欄位值"""
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def upsert_statement(table: str, doc: dict):
+    """產生寫入一筆資料的 SQL 與參數"""
+    columns = SCHEMA[table]
+    placeholders = ", ".join("?" * (len(columns) + 2))
+    sql = f"INSERT OR REPLACE INTO {table} (id, {', '.join(columns)}, doc) VALUES ({placeholders})"
+    params = (
+        doc["id"],
+        *(column_value(doc.get(column)) for column in columns),
+        json.dumps(doc, ensure_ascii=False, default=str),
+    )
+    return sql, params
+
+
+class SqliteTable(MutableMapping):
+    """以 dict 介面包裝一張 SQLite 資料表"""
+
+    def __init__(self, store: "SqliteStore", name: str):
+        self.store = store
+        self.name = name
+        self.cached = name in CACHED_TABLES
+        self.cache = {}      # 快取表：全部資料
+        self.overlay = {}    # 非快取表：尚未寫入的資料，值為 doc 或 DELETED
+        self.cleared = False  # 非快取表：已清空但尚未寫入
+        self.clear_generation = 0
+        if self.cached:
+            self.reload()
+
+    def reload(self):
+        """重新從資料庫載入快取"""
+        rows = self.store.reader.execute(f"SELECT id, doc FROM {self.name}")
+        self.cache = {row_id: json.loads(doc) for row_id, doc in rows}
+
+    def _load(self, key):
+        if self.cleared:
+            return None
+        row = self.store.reader.execute(
+            f"SELECT doc FROM {self.name} WHERE id = ?", (key,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _fetch(self, keys) -> dict:
+        """一次讀出多筆資料庫中的資料 {id: doc}（分批以 IN 查詢）"""
+        docs = {}
+        if self.cleared:
+            return docs
+        keys = list(keys)
+        for i in range(0, len(keys), SQL_MAX_PARAMS):
+            chunk = keys[i:i + SQL_MAX_PARAMS]
+            rows = self.store.reader.execute(
+                f"SELECT id, doc FROM {self.name} WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            docs.update((row_id, json.loads(doc)) for row_id, doc in rows)
+        return docs
+
+    def pending(self) -> list:
+        """尚未寫入的異動 [(資料庫中的版本, 新版本)]，不存在或已刪除的一方為 None
+
+        查詢資料庫的統計結果扣除前者、加上後者，即為包含暫存異動的結果。
+        """
+        overlay = dict(self.overlay)
+        stored = self._fetch(overlay)
+        return [(stored.get(key), None if doc is DELETED else doc) for key, doc in overlay.items()]
+
+    def _stored_ids(self):
+        if self.cleared:
+            return
+        for (row_id,) in self.store.reader.execute(f"SELECT id FROM {self.name}"):
+            yield row_id
+
+    def __getitem__(self, key):
+        if self.cached:
+            return self.cache[key]
+        doc = self.overlay.get(key)
+        if doc is None:
+            doc = self._load(key)
+        if doc is None or doc is DELETED:
+            raise KeyError(key)
+        return doc
+
+    def __setitem__(self, key, doc):
+        if self.cached:
+            self.cache[key] = doc
+        else:
+            self.overlay[key] = doc
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if self.cached:
+            del self.cache[key]
+        else:
+            self.overlay[key] = DELETED
+
+    def __contains__(self, key):
+        if self.cached:
+            return key in self.cache
+        doc = self.overlay.get(key)
+        if doc is not None:
+            return doc is not DELETED
+        return self._load(key) is not None
+
+    def __iter__(self):
+        if self.cached:
+            yield from list(self.cache)
+            return
+        overlay = dict(self.overlay)
+        for key, doc in overlay.items():
+            if doc is not DELETED:
+                yield key
+        for key in self._stored_ids():
+            if key not in overlay:
+                yield key
+
+    def __len__(self):
+        if self.cached:
+            return len(self.cache)
+        count = 0
+        if not self.cleared:
+            count = self.store.reader.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+        for stored, doc in self.pending():
+            count += (doc is not None) - (stored is not None)
+        return count
+
+    def get_many(self, keys) -> list:
+        """依序取出多筆資料（略過不存在的），資料庫中的資料一次查詢"""
+        keys = list(keys)
+        if self.cached:
+            return [self.cache[key] for key in keys if key in self.cache]
+        overlay = self.overlay
+        stored = self._fetch(key for key in keys if key not in overlay)
+        docs = []
+        for key in keys:
+            doc = overlay[key] if key in overlay else stored.get(key)
+            if doc is not None and doc is not DELETED:
+                docs.append(doc)
+        return docs
+
+    def find_ids(self, **conditions) -> list:
+        """依欄位值（皆為相等條件）找出資料 id，依寫入順序；已併入尚未寫入的異動
+
+        只用於非快取表，欄位須為 SCHEMA 拆出的欄位並有索引（見 INDEXES）。
+        """
+        ids = []
+        if not self.cleared:
+            where = " AND ".join(f"{column} = ?" for column in conditions)
+            rows = self.store.reader.execute(
+                f"SELECT id FROM {self.name} WHERE {where} ORDER BY rowid", tuple(conditions.values())
+            )
+            ids = [row_id for (row_id,) in rows]
+        overlay = self.overlay
+        if overlay:
+            ids = [row_id for row_id in ids if row_id not in overlay]
+            ids.extend(
+                key for key, doc in overlay.items()
+                if doc is not DELETED and all(doc.get(column) == value for column, value in conditions.items())
+            )
+        return ids
+
+    def positions_after(self, columns: tuple, position=None, limit=None, **conditions) -> list:
+        """依 columns 排序（最後一欄須為 id，順序才唯一），取得 position 之後（不含）的位置，最多 limit 筆
+
+        位置為各欄位值的 tuple，conditions 為相等條件；已併入尚未寫入的異動。
+        """
+        clauses = [f"{column} = ?" for column in conditions]
+        params = list(conditions.values())
+        if position is not None:
+            clauses.append(f"({', '.join(columns)}) > ({', '.join('?' * len(columns))})")
+            params.extend(position)
+        sql = f"SELECT {', '.join(columns)} FROM {self.name}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {', '.join(columns)}"
+        overlay = dict(self.overlay)
+        if limit is not None:
+            # 已被暫存異動取代的資料列會被略過，多取相同筆數以補足
+            sql += " LIMIT ?"
+            params.append(limit + len(overlay))
+        positions = [] if self.cleared else self.store.reader.execute(sql, params).fetchall()
+        if overlay:
+            positions = [p for p in positions if p[-1] not in overlay]
+            for doc in overlay.values():
+                if doc is DELETED or any(doc.get(column) != value for column, value in conditions.items()):
+                    continue
+                p = tuple(doc.get(column) for column in columns)
+                if position is None or p > tuple(position):
+                    positions.append(p)
+            positions.sort()
+        return positions[:limit]
+
+    def items(self):
+        """逐筆讀出資料（非快取表以游標串流，不會一次載入整張表）"""
+        if self.cached:
+            return list(self.cache.items())
+        return self._iter_items()
+
+    def _iter_items(self):
+        overlay = dict(self.overlay)
+        for key, doc in overlay.items():
+            if doc is not DELETED:
+                yield key, doc
+        if self.cleared:
+            return
+        for key, doc in self.store.reader.execute(f"SELECT id, doc FROM {self.name}"):
+            if key not in overlay:
+                yield key, json.loads(doc)
+
+    def values(self):
+        if self.cached:
+            return list(self.cache.values())
+        return (doc for _, doc in self._iter_items())
+
+    def keys(self):
+        return iter(self)
+
+    def clear(self):
+        if self.cached:
+            self.cache.clear()
+        else:
+            self.overlay.clear()
+            self.cleared = True
+            self.clear_generation += 1
+
+
+class RecordTable(SqliteTable):
+    """簽到記錄表：另提供期間積分的加總查詢"""
+
+    def points_by(self, group: str, start: Optional[str] = None, end: Optional[str] = None,
+                  member_ids=None) -> dict:
+        """依人員（group="member_id"）或日期（group="day"）加總積分，回傳 {key: [積分, 次數]}
+
+        只計 checked_in_at 介於 [start, end) 的記錄，member_ids 限定人員；已併入尚未寫入的異動。
+        """
+        key = "member_id" if group == "member_id" else "substr(checked_in_at, 1, 10)"
+        clauses, params = ["member_id IS NOT NULL"], []
+        if start is not None:
+            clauses.append("checked_in_at >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("checked_in_at < ?")
+            params.append(end)
+        sql = f"SELECT {key}, SUM(points_awarded), COUNT(*) FROM {self.name} WHERE {' AND '.join(clauses)}"
+        if member_ids is None:
+            queries = [(sql, params)]
+        else:
+            member_ids = list(member_ids)
+            queries = [
+                (f"{sql} AND member_id IN ({', '.join('?' * len(chunk))})", params + chunk)
+                for chunk in (member_ids[i:i + SQL_MAX_PARAMS] for i in range(0, len(member_ids), SQL_MAX_PARAMS))
+            ]
+        totals = {}
+        if not self.cleared:
+            for query, query_params in queries:
+                for group_key, points, count in self.store.reader.execute(f"{query} GROUP BY {key}", query_params):
+                    total = totals.setdefault(group_key, [0, 0])
+                    total[0] += points or 0
+                    total[1] += count
+
+        members = None if member_ids is None else set(member_ids)
+        for stored, doc in self.pending():
+            for record, sign in ((stored, -1), (doc, 1)):
+                if record is None or not record.get("member_id"):
+                    continue
+                checked_in_at = record["checked_in_at"]
+                if (start is not None and checked_in_at < start) or (end is not None and checked_in_at >= end):
+                    continue
+                if members is not None and record["member_id"] not in members:
+                    continue
+                group_key = record["member_id"] if group == "member_id" else checked_in_at[:10]
+                total = totals.setdefault(group_key, [0, 0])
+                total[0] += sign * (record.get("points_awarded") or 0)
+                total[1] += sign
+                if not total[1]:
+                    del totals[group_key]
+        return totals
+
+
+class SqliteStore:
+    """SQLite 儲存引擎：讀取使用事件迴圈上的連線，寫入使用獨立連線
+
+    track_changes=True 時（多工作行程），每次寫入同時記錄 changes 表與各集合的版本（versions 表），
+    並以 poll_changes() 取得其他行程寫入的異動；versions 為目前已同步到的各集合版本。
+    """
+
+    def __init__(self, path: str, track_changes: bool = False):
+        self.path = path
+        self.track_changes = track_changes
+        self.writer = connect(path)
+        self.reader = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # 先記下目前的異動位置再載入資料，載入期間的異動之後會再同步一次
+        self.last_seq = self.max_seq()
+        self.data_version = self.reader.execute("PRAGMA data_version").fetchone()[0]
+        self.store_id = self.reader.execute("SELECT value FROM meta WHERE key = 'store_id'").fetchone()[0]
+        self.versions = self.load_versions()
+        self.tables = {
+            name: (RecordTable if name == "checkin_records" else SqliteTable)(self, name) for name in SCHEMA
+        }
+
+    def max_seq(self) -> int:
+        return self.reader.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def load_versions(self) -> dict:
+        return dict(self.reader.execute("SELECT collection, seq FROM versions").fetchall())
+
+    def prepare(self, ops):
+        """將日誌格式的異動轉成 SQL（需在事件迴圈上執行）
+
+        回傳 (statements, written)，written 供寫入完成後 settle() 清除暫存。
+        """
+        statements = []
+        written = []
+        for op in ops:
+            table = self.tables[op["c"]]
+            if op["op"] == "put":
+                statements.append(upsert_statement(op["c"], op["v"]))
+                written.append((table, op["v"]["id"], table.overlay.get(op["v"]["id"])))
+            elif op["op"] == "del":
+                statements.append((f"DELETE FROM {op['c']} WHERE id = ?", (op["id"],)))
+                written.append((table, op["id"], table.overlay.get(op["id"])))
+            elif op["op"] == "clear":
+                statements.append((f"DELETE FROM {op['c']}", ()))
+                written.append((table, None, table.clear_generation))
+            if self.track_changes:
+                doc_id = op["v"]["id"] if op["op"] == "put" else op.get("id")
+                statements.append((
+                    "INSERT INTO changes (op, collection, doc_id) VALUES (?, ?, ?)",
+                    (op["op"], op["c"], doc_id)
+                ))
+        if self.track_changes and statements:
+            for collection in dict.fromkeys(op["c"] for op in ops):
+                statements.append((
+                    "INSERT INTO versions (collection, seq) VALUES (?, (SELECT MAX(seq) FROM changes)) "
+                    "ON CONFLICT(collection) DO UPDATE SET seq = excluded.seq",
+                    (collection,)
+                ))
+            statements.append((
+                "DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?",
+                (CHANGES_KEEP,)
+            ))
+        return statements, written
+
+    def write(self, statements) -> int:
+        """以單一交易寫入（可在其他執行緒執行），回傳寫入的資料量（文字參數的位元組數，約略值）"""
+        size = 0
+        self.writer.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                self.writer.execute(sql, params)
+                size += sum(len(value.encode()) for value in params if isinstance(value, str))
+            if self.track_changes:
+                # 呼叫端持有跨行程寫入鎖，此時之前的異動都已同步，自己的異動不需再套用
+                self.last_seq = self.writer.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM changes"
+                ).fetchone()[0]
+                self.versions = dict(self.writer.execute("SELECT collection, seq FROM versions").fetchall())
+            self.writer.execute("COMMIT")
+        except Exception:
+            self.writer.execute("ROLLBACK")
+            raise
+        return size
+
+    def settle(self, written):
+        """寫入完成後，移除已寫入資料庫的暫存（需在事件迴圈上執行）"""
+        for table, key, marker in written:
+            if table.cached:
+                continue
+            if key is None:
+                if table.clear_generation == marker:
+                    table.cleared = False
+            elif marker is not None and table.overlay.get(key) is marker:
+                del table.overlay[key]
+
+
+    def poll_changes(self):
+        """取得其他行程寫入的異動 [(op, collection, doc_id)]
+
+        以 PRAGMA data_version 判斷資料庫是否被其他連線修改過，沒有異動時不查詢 changes 表。
+        落後太多、所需的異動紀錄已被清除時回傳 None，需整批重新載入。
+        """
+        version = self.reader.execute("PRAGMA data_version").fetchone()[0]
+        if version == self.data_version:
+            return []
+        self.data_version = version
+        oldest = self.reader.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+        if oldest is not None and oldest > self.last_seq + 1:
+            self.last_seq = self.max_seq()
+            self.versions = self.load_versions()
+            return None
+        rows = self.reader.execute(
+            "SELECT seq, op, collection, doc_id FROM changes WHERE seq > ? ORDER BY seq",
+            (self.last_seq,)
+        ).fetchall()
+        if rows:
+            self.last_seq = rows[-1][0]
+            self.versions = {**self.versions, **{collection: seq for seq, _, collection, _ in rows}}
+        return [(op, collection, doc_id) for _, op, collection, doc_id in rows]
+
+    def refresh(self, collection: str, doc_id: str) -> Optional[dict]:
+        """重新讀取一筆資料（更新快取），已刪除時回傳 None"""
+        table = self.tables[collection]
+        doc = table._load(doc_id)
+        if table.cached:
+            if doc is None:
+                table.cache.pop(doc_id, None)
+            else:
+                table.cache[doc_id] = doc
+        return doc
+
+    def reload(self):
+        """整批重新載入快取表"""
+        for table in self.tables.values():
+            if table.cached:
+                table.reload()
+
+
+def import_data(data: dict, path: str, force: bool = False) -> dict:
+    """將 db.json 格式的資料匯入 SQLite，回傳各表匯入筆數"""
+    conn = connect(path)
+    existing = sum(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in SCHEMA)
+    if existing and not force:
+        raise RuntimeError(f"{path} 已有 {existing} 筆資料，如要覆蓋請加上 --force")
+    counts = {}
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for table in SCHEMA:
+            conn.execute(f"DELETE FROM {table}")
+            docs = data.get(table, {}).values()
+            for doc in docs:
+                conn.execute(*upsert_statement(table, doc))
+            counts[table] = len(docs)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return counts
@@ -0,0 +1,133 @@
+"""
+測試資料產生器
+=====================================
+依指定規模產生人員、團隊、事件與簽到記錄，格式與 db.json 相同，用於效能測試。
+
+- 同一組參數與 seed 產生的資料完全相同，方便比較不同版本的測試結果
+- 每位人員在同一事件最多簽到一次，人員積分等於其簽到記錄的積分總和
+
+使用方式：
+    python synthetic_data.py --members 5000 --events 200 --records 200000 --output data/db.json
+    （輸出檔名以 .bin 結尾時寫成二進位快照）
+"""
+
+from datetime import datetime, timedelta
+import argparse
+import json
+import os
+import random
+
+TEAM_NAMES = ["技術部", "行銷部", "人資部", "財務部", "業務部", "客服部", "設計部", "法務部"]
+SURNAMES = "陳林黃張李王吳劉蔡楊許鄭謝郭洪曾邱廖賴周"
+GIVEN_NAMES = "志明俊傑建宏家豪冠宇怡君雅婷佳穎淑芬美玲承恩宗翰品妤"
+
+
+def generate(members: int, events: int, records: int, teams: int = None, seed: int = 42) -> dict:
+    """產生 db.json 格式的資料"""
+    if records > members * events:
+        raise ValueError(f"簽到記錄數不可超過 人員數 × 事件數（{members * events}）")
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1)
+    teams = teams if teams is not None else max(1, min(len(TEAM_NAMES) * 4, members // 50))
+
+    data = {"members": {}, "teams": {}, "events": {}, "checkin_records": {}}
+
+    team_ids = []
+    for i in range(teams):
+        team_id = f"team-{i:08x}"
+        name = TEAM_NAMES[i % len(TEAM_NAMES)]
+        if i >= len(TEAM_NAMES):
+            name = f"{name}{i // len(TEAM_NAMES) + 1}"
+        data["teams"][team_id] = {
+            "id": team_id,
+            "name": name,
+            "description": None,
+            "created_at": (now - timedelta(days=400)).isoformat()
+        }
+        team_ids.append(team_id)
+
+    member_ids = []
+    for i in range(members):
+        member_id = f"member-{i:08x}"
+        name = rng.choice(SURNAMES) + "".join(rng.sample(GIVEN_NAMES, 2))
+        data["members"][member_id] = {
+            "id": member_id,
+            "name": name,
+            "team_id": rng.choice(team_ids) if team_ids else None,
+            "email": f"user{i}@example.com" if rng.random() < 0.7 else None,
+            "points": 0,
+            "created_at": (now - timedelta(days=365, seconds=members - i)).isoformat()
+        }
+        member_ids.append(member_id)
+
+    event_list = []
+    for i in range(events):
+        event_id = f"event-{i:08x}"
+        day = now - timedelta(days=365 * (events - i) // max(events, 1))
+        event = {
+            "id": event_id,
+            "name": f"活動 {i + 1}",
+            "points": float(rng.choice([1, 2, 5, 10])),
+            "date": day.date().isoformat(),
+            "time": "09:00",
+            "status": "completed" if i < events - 3 else "active",
+            "description": None,
+            "created_at": (day - timedelta(days=7)).isoformat()
+        }
+        data["events"][event_id] = event
+        event_list.append((event, day))
+
+    # 隨機挑選不重複的 (事件, 人員) 組合
+    pairs = set()
+    if records > members * events // 2:
+        # 接近全部組合時改為洗牌後取前 records 個，避免重複抽樣太久
+        everything = [(e, m) for e in range(events) for m in range(members)]
+        rng.shuffle(everything)
+        pairs = everything[:records]
+    else:
+        while len(pairs) < records:
+            pairs.add((rng.randrange(events), rng.randrange(members)))
+        pairs = sorted(pairs)
+
+    for i, (e, m) in enumerate(pairs):
+        event, day = event_list[e]
+        member = data["members"][member_ids[m]]
+        record_id = f"record-{i:08x}"
+        member["points"] += event["points"]
+        data["checkin_records"][record_id] = {
+            "id": record_id,
+            "event_id": event["id"],
+            "member_id": member["id"],
+            "member_name": member["name"],
+            "points_awarded": event["points"],
+            "checked_in_at": (day + timedelta(hours=9, seconds=rng.randrange(7200))).isoformat()
+        }
+    return data
+
+
+def write(data: dict, path: str):
+    """寫入 db.json，檔名以 .bin 結尾時寫成二進位快照"""
+    if path.endswith(".bin"):
+        import binary_snapshot
+        binary_snapshot.write(data, path)
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="產生效能測試用的資料")
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--teams", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", required=True, help="輸出路徑（.json 或 .bin）")
+    args = parser.parse_args()
+
+    data = generate(args.members, args.events, args.records, args.teams, args.seed)
+    write(data, args.output)
+    print(f"已產生 {args.output}: " + ", ".join(f"{name} {len(docs)}" for name, docs in data.items()))
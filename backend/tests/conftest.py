@@ -0,0 +1,16 @@
+"""
+測試共用設定
+=====================================
+main 在匯入時就會載入資料，必須先把資料路徑指到暫存目錄，測試不會動到 data/ 內的資料。
+"""
+
+import os
+import sys
+import tempfile
+
+DATA_DIR = tempfile.mkdtemp(prefix="signin-test-")
+os.environ["DATA_FILE"] = os.path.join(DATA_DIR, "db.json")
+os.environ["SQLITE_FILE"] = os.path.join(DATA_DIR, "db.sqlite3")
+os.environ.setdefault("STORAGE_BACKEND", "json")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,48 @@
+"""簽到佇列：等待寫入磁碟的請求不可擋住後續批次"""
+
+import asyncio
+
+import main
+
+
+class SlowFlusher:
+    """寫入磁碟要等到測試放行才完成"""
+
+    def __init__(self):
+        self.released = asyncio.Event()
+
+    def notify(self):
+        pass
+
+    async def wait_durable(self):
+        await self.released.wait()
+
+
+def test_durable_checkin_does_not_block_queue(monkeypatch):
+    main.put_doc("events", {"id": "event-queue", "name": "佇列", "status": "active", "points": 1})
+    for member_id in ("member-queue-1", "member-queue-2"):
+        main.put_doc("members", {"id": member_id, "name": member_id, "points": 0})
+
+    async def scenario():
+        flusher = SlowFlusher()
+        monkeypatch.setattr(main, "flusher", flusher)
+        queue = main.CheckinQueue(10)
+        queue.start()
+
+        async def durable_checkin():
+            main.wait_durable.set(True)
+            return await queue.submit("event-queue", ["member-queue-1"])
+
+        durable = asyncio.create_task(durable_checkin())
+        await asyncio.sleep(0.01)
+        # 前一個請求仍在等待寫入磁碟，後續批次照常處理
+        records = await asyncio.wait_for(queue.submit("event-queue", ["member-queue-2"]), timeout=1)
+        assert [record["member_id"] for record in records] == ["member-queue-2"]
+        assert not durable.done()
+
+        flusher.released.set()
+        records = await asyncio.wait_for(durable, timeout=1)
+        assert [record["member_id"] for record in records] == ["member-queue-1"]
+        await queue.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,52 @@
+"""簽到記錄分頁游標"""
+
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+def raw_cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def test_round_trip():
+    position = ("2026-01-01T09:00:00", "record-1")
+    assert main.decode_cursor(main.encode_cursor(position)) == position
+
+
+@pytest.mark.parametrize("cursor", [
+    raw_cursor([1, "x"]),
+    raw_cursor(["2026-01-01T09:00:00", 2]),
+    raw_cursor(["not a time", "record-1"]),
+    raw_cursor(["2026-01-01T09:00:00"]),
+    "%%%",
+])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        main.decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("format", ["json", "ndjson"])
+def test_public_leaderboard_rejects_bad_cursor(format):
+    from fastapi.testclient import TestClient
+
+    with TestClient(main.app) as client:
+        response = client.get("/api/public/leaderboard", params={"after": raw_cursor([1, "x"]), "format": format})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "無效的 cursor"}
+
+
+def test_public_leaderboard_limit_has_default_and_maximum():
+    from fastapi.testclient import TestClient
+
+    with TestClient(main.app) as client:
+        response = client.get("/api/public/leaderboard")
+        too_large = client.get("/api/public/leaderboard", params={"limit": main.PUBLIC_PAGE_MAX + 1})
+    assert response.status_code == 200
+    assert "next_cursor" in response.json()
+    assert too_large.status_code == 422
@@ -0,0 +1,27 @@
+"""X-Wait-Durable：背景寫入時等待資料寫入磁碟才回應"""
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+def login(client) -> dict:
+    response = client.post("/api/auth/login", json={
+        "username": main.ADMIN_USERNAME, "password": main.ADMIN_PASSWORD
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_wait_durable_header(monkeypatch):
+    # 背景寫入間隔設得很長，未等待的請求回應時異動一定還在記憶體中
+    monkeypatch.setattr(main, "FLUSH_INTERVAL_MS", 60_000)
+    monkeypatch.setattr(main, "CHECKIN_QUEUE_SIZE", 0)
+    with TestClient(main.app) as client:
+        headers = login(client)
+
+        client.post("/api/members", headers=headers, json={"name": "不等待"})
+        assert main.pending_changes
+
+        response = client.post("/api/members", headers={**headers, "X-Wait-Durable": "1"}, json={"name": "等待"})
+        assert response.status_code == 200
+        assert not main.pending_changes
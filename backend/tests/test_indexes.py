@@ -0,0 +1,67 @@
+"""索引一致性：混合新增、修改、刪除與清空後，check_indexes() 不應回報任何差異"""
+
+import random
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+def login(client) -> dict:
+    response = client.post("/api/auth/login", json={
+        "username": main.ADMIN_USERNAME, "password": main.ADMIN_PASSWORD
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_indexes_stay_consistent_after_mixed_writes():
+    rng = random.Random(5)
+    with TestClient(main.app) as client:
+        headers = login(client)
+
+        def post(path, **body):
+            response = client.post(path, headers=headers, json=body)
+            assert response.status_code == 200, response.text
+            return response.json()
+
+        for round_no in range(3):
+            teams = [post("/api/teams", name=f"團隊{round_no}-{i}")["id"] for i in range(4)]
+            members = [
+                post("/api/members", name=f"人員{round_no}-{i}", team_id=rng.choice(teams),
+                     email=f"user{round_no}-{i}@example.com")["id"]
+                for i in range(30)
+            ]
+            events = [
+                post("/api/events", name=f"活動{round_no}-{i}", points=rng.randint(1, 5),
+                     date=f"2026-0{i + 1}-1{round_no}")["id"]
+                for i in range(4)
+            ]
+
+            for event_id in events:
+                post("/api/checkin/batch", event_id=event_id, member_ids=rng.sample(members, 12))
+                for member_id in rng.sample(members, 5):
+                    post("/api/checkin", event_id=event_id, member_ids=[member_id])
+
+            # 換團隊、改名、刪除人員／團隊／事件與簽到記錄
+            for member_id in rng.sample(members, 8):
+                response = client.put(f"/api/members/{member_id}", headers=headers, json={
+                    "name": f"改名{member_id}", "team_id": rng.choice(teams)
+                })
+                assert response.status_code == 200
+            for member_id in rng.sample(members, 5):
+                assert client.delete(f"/api/members/{member_id}", headers=headers).status_code == 200
+            assert client.delete(f"/api/teams/{teams[0]}", headers=headers).status_code in (200, 400)
+            assert client.delete(f"/api/events/{events[0]}", headers=headers).status_code == 200
+            records = client.get("/api/checkin-records", headers=headers, params={"limit": 10}).json()["records"]
+            for record in records[:5]:
+                assert client.delete(f"/api/checkin-records/{record['id']}", headers=headers).status_code == 200
+            assert main.check_indexes() == []
+
+            if round_no == 0:
+                post("/api/members/reset-all-points")
+            elif round_no == 1:
+                post("/api/events/clear-all")
+            assert main.check_indexes() == []
+
+        post("/api/system/reset-all")
+        assert main.check_indexes() == []
@@ -0,0 +1,48 @@
+"""journal 模式的日誌重播"""
+
+import json
+
+import main
+
+
+def journal_line(member_id: str) -> str:
+    member = {"id": member_id, "name": member_id, "team_id": None, "email": None, "points": 0,
+              "created_at": "2026-01-01T00:00:00"}
+    return json.dumps({"ops": [{"op": "put", "c": "members", "v": member}]})
+
+
+def test_torn_tail_is_truncated_before_next_append(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_FILE", str(tmp_path / "db.json"))
+    monkeypatch.setattr(main, "BINARY_FILE", str(tmp_path / "db.bin"))
+    monkeypatch.setattr(main, "JOURNAL_FILE", str(tmp_path / "db.journal"))
+    monkeypatch.setattr(main, "PERSIST_MODE", "journal")
+
+    main.append_journal(journal_line("member-a"))
+    # 模擬寫到一半當機：最後一行不完整
+    with open(main.JOURNAL_FILE, "ab") as f:
+        f.write(b'{"ops": [{"op": "put", "c": "mem')
+
+    data = main.load_json_db()
+    assert set(data["members"]) == {"member-a"}
+
+    # 重啟後的提交不可接在殘缺的內容後面
+    main.append_journal(journal_line("member-b"))
+    data = main.load_json_db()
+    assert set(data["members"]) == {"member-a", "member-b"}
+
+
+def test_unterminated_last_line_is_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_FILE", str(tmp_path / "db.json"))
+    monkeypatch.setattr(main, "BINARY_FILE", str(tmp_path / "db.bin"))
+    monkeypatch.setattr(main, "JOURNAL_FILE", str(tmp_path / "db.journal"))
+    monkeypatch.setattr(main, "PERSIST_MODE", "journal")
+
+    main.append_journal(journal_line("member-a"))
+    # 內容完整但換行尚未寫入，fsync 前當機時可能發生
+    with open(main.JOURNAL_FILE, "ab") as f:
+        f.write(journal_line("member-x").encode())
+
+    data = main.load_json_db()
+    assert set(data["members"]) == {"member-a"}
+    main.append_journal(journal_line("member-b"))
+    assert set(main.load_json_db()["members"]) == {"member-a", "member-b"}
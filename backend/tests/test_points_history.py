@@ -0,0 +1,61 @@
+"""積分分桶與期間排行的日期範圍"""
+
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+def record(record_id: str, member_id: str, day: str, points: float) -> dict:
+    return {"id": record_id, "event_id": "event-1", "member_id": member_id,
+            "points_awarded": points, "checked_in_at": f"{day}T09:00:00"}
+
+
+@pytest.fixture
+def history():
+    index = main.PointsHistoryIndex("checkin_records")
+    index.build([
+        record("r1", "m1", "2025-12-30", 1.0),
+        record("r2", "m1", "2026-01-05", 2.0),
+        record("r3", "m2", "2026-01-31", 5.0),
+        record("r4", "m2", "2026-02-02", 3.0),
+    ])
+    return index
+
+
+def test_totals_matches_records(history):
+    assert history.totals(date(2026, 1, 1), date(2026, 1, 31)) == {"m1": [2.0, 1], "m2": [5.0, 1]}
+    assert history.totals(None, None) == {"m1": [3.0, 2], "m2": [8.0, 2]}
+
+
+def test_totals_with_extreme_bounds(history):
+    assert history.totals(date.min, date.max) == {"m1": [3.0, 2], "m2": [8.0, 2]}
+    assert history.totals(date(9999, 12, 1), date.max) == {}
+
+
+def test_window_near_date_max():
+    assert main.leaderboard_window("month", date(9999, 12, 5), None, None) == (date(9999, 12, 1), date(9999, 12, 31))
+    with pytest.raises(HTTPException) as error:
+        main.leaderboard_window("week", date(9999, 12, 31), None, None)
+    assert error.value.status_code == 422
+
+
+def test_build_matches_incremental_updates(history):
+    records = [
+        record("r1", "m1", "2025-12-30", 1.0),
+        record("r2", "m1", "2026-01-05", 2.0),
+        record("r3", "m2", "2026-01-31", 5.0),
+        record("r4", "m2", "2026-02-02", 3.0),
+        record("r5", "m1", "2026-01-05", 0.5),
+        {"id": "r6", "event_id": "event-1", "member_id": "m1", "checked_in_at": "not-a-date"},
+    ]
+    incremental = main.PointsHistoryIndex("checkin_records")
+    for doc in records:
+        incremental.add(doc)
+    incremental.remove(records[2])
+    rebuilt = history.empty_copy()
+    rebuilt.build(records[:2] + records[3:])
+    assert rebuilt.periods == incremental.periods
+    assert rebuilt.members == incremental.members
@@ -0,0 +1,119 @@
+"""SQLite 儲存引擎：簽到記錄的資料表查詢須與記憶體索引的結果相同（含尚未寫入的異動）"""
+
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import main
+from sqlite_store import SqliteStore
+
+
+def write(store, ops):
+    statements, written = store.prepare(ops)
+    store.write(statements)
+    store.settle(written)
+
+
+def make_records(rng, count, prefix):
+    start = datetime(2026, 1, 1)
+    return [{
+        "id": f"{prefix}-{i:04d}",
+        "event_id": f"event-{rng.randrange(4)}",
+        "member_id": f"member-{rng.randrange(12)}",
+        "points_awarded": rng.choice((1, 2.5, 3)),
+        "checked_in_at": (start + timedelta(minutes=rng.randrange(60 * 24 * 90))).isoformat(),
+    } for i in range(count)]
+
+
+@pytest.fixture
+def records(tmp_path):
+    """一半已寫入資料庫、一半只在記憶體中，另刪除部分已寫入的記錄；回傳 (資料表, 目前應有的記錄)"""
+    rng = random.Random(7)
+    store = SqliteStore(str(tmp_path / "db.sqlite3"))
+    table = store.tables["checkin_records"]
+    stored = make_records(rng, 150, "stored")
+    write(store, [{"op": "put", "c": "checkin_records", "v": record} for record in stored])
+    docs = {record["id"]: record for record in stored}
+    for record in make_records(rng, 150, "pending"):
+        table[record["id"]] = docs[record["id"]] = record
+    for record_id in rng.sample(sorted(docs), 40):
+        del table[record_id]
+        del docs[record_id]
+    return table, docs
+
+
+def test_lookup_and_count(records):
+    table, docs = records
+    assert len(table) == len(docs)
+    expected = main.SecondaryIndex("checkin_records", lambda r: (r["event_id"], r["member_id"]))
+    expected.build(docs.values())
+    for event in range(4):
+        for member in range(12):
+            key = (f"event-{event}", f"member-{member}")
+            assert sorted(table.find_ids(event_id=key[0], member_id=key[1])) == sorted(expected.get(key))
+
+
+@pytest.mark.parametrize("conditions", [{}, {"event_id": "event-1"}, {"member_id": "member-3"}])
+def test_positions_after_pages_in_order(records, conditions):
+    table, docs = records
+    expected = sorted(
+        (r["checked_in_at"], r["id"]) for r in docs.values()
+        if all(r[column] == value for column, value in conditions.items())
+    )
+    pages, position = [], None
+    while True:
+        page = table.positions_after(("checked_in_at", "id"), position, 7, **conditions)
+        if not page:
+            break
+        pages.extend(page)
+        position = page[-1]
+    assert pages == expected
+    assert table.get_many(record_id for _, record_id in expected) == [docs[rid] for _, rid in expected]
+
+
+def test_points_by_matches_points_history(records):
+    table, docs = records
+    history = main.PointsHistoryIndex("checkin_records")
+    history.build(docs.values())
+    for start, end in [(None, None), (date(2026, 1, 10), date(2026, 2, 20)), (date(2026, 3, 1), date.max)]:
+        have = table.points_by("member_id", *main.date_range_keys(start, end))
+        want = history.totals(start, end)
+        assert have.keys() == want.keys()
+        for member_id, (points, count) in want.items():
+            assert have[member_id][1] == count
+            assert have[member_id][0] == pytest.approx(points)
+
+    member_ids = ["member-1", "member-5"]
+    days = table.points_by("day", member_ids=member_ids)
+    want = {}
+    for record in docs.values():
+        if record["member_id"] in member_ids:
+            total = want.setdefault(record["checked_in_at"][:10], [0, 0])
+            total[0] += record["points_awarded"]
+            total[1] += 1
+    assert days == want
+
+
+def test_cleared_table_only_has_pending_records(records):
+    table, _ = records
+    table.clear()
+    table["new"] = {"id": "new", "event_id": "event-0", "member_id": "member-0",
+                    "points_awarded": 1, "checked_in_at": "2026-05-01T08:00:00"}
+    assert len(table) == 1
+    assert table.find_ids(event_id="event-0", member_id="member-0") == ["new"]
+    assert table.positions_after(("checked_in_at", "id")) == [("2026-05-01T08:00:00", "new")]
+    assert table.points_by("member_id") == {"member-0": [1, 1]}
+
+
+def test_versions_are_shared_between_processes(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    writer, reader = SqliteStore(path, track_changes=True), SqliteStore(path, track_changes=True)
+    assert writer.store_id == reader.store_id
+    write(writer, [{"op": "put", "c": "members", "v": {"id": "m1", "name": "A", "points": 0}},
+                   {"op": "put", "c": "teams", "v": {"id": "t1", "name": "T"}}])
+    write(writer, [{"op": "put", "c": "members", "v": {"id": "m1", "name": "B", "points": 0}}])
+    assert reader.poll_changes() == [("put", "members", "m1"), ("put", "teams", "t1"), ("put", "members", "m1")]
+    assert reader.versions == writer.versions
+    assert writer.versions["members"] > writer.versions["teams"]
+    assert SqliteStore(path, track_changes=True).versions == writer.versions
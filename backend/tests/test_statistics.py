@@ -0,0 +1,51 @@
+"""統計資料：累計計數與完整重算的比對"""
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+def login(client) -> dict:
+    response = client.post("/api/auth/login", json={
+        "username": main.ADMIN_USERNAME, "password": main.ADMIN_PASSWORD
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_verify_tolerates_float_rounding_in_team_statistics():
+    main.put_doc("teams", {"id": "team-stats", "name": "統計", "description": None, "created_at": "2026-01-01"})
+    members = [
+        {"id": f"member-stats-{i}", "name": f"統計{i}", "team_id": "team-stats", "points": points}
+        for i, points in enumerate((0.1, 0.2, 0.3))
+    ]
+    for member in members:
+        main.put_doc("members", member)
+    # 改過再改回：累計值與重新加總的結果差在最後一位
+    members[0]["points"] = 0.7
+    main.put_doc("members", members[0])
+    members[0]["points"] = 0.1
+    main.put_doc("members", members[0])
+    assert main.member_stats.get(("team_points", "team-stats")) != sum(m["points"] for m in members)
+
+    with TestClient(main.app) as client:
+        response = client.get("/api/statistics", params={"verify": "true"}, headers=login(client))
+    assert response.status_code == 200
+    assert response.json()["drift"] == {}
+
+    for member in members:
+        main.delete_doc("members", member["id"])
+    main.delete_doc("teams", "team-stats")
+
+
+def test_verify_reports_team_drift():
+    main.put_doc("members", {"id": "member-drift", "name": "偏差", "team_id": None, "points": 5})
+    main.member_stats.counters[("team_points", None)] += 1
+    try:
+        with TestClient(main.app) as client:
+            drift = client.get("/api/statistics", params={"verify": "true"}, headers=login(client)).json()["drift"]
+        assert list(drift) == ["team_statistics"]
+        (team,) = drift["team_statistics"].values()
+        assert team["actual"]["total_points"] - team["expected"]["total_points"] == 1
+    finally:
+        main.member_stats.counters[("team_points", None)] -= 1
+        main.delete_doc("members", "member-drift")
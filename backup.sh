@@ -7,24 +7,62 @@
 # 設定
 PROJECT_DIR="$(cd "$(dirname "$0")" && pwd)"
 DATA_FILE="$PROJECT_DIR/data/db.json"
+JOURNAL_FILE="$PROJECT_DIR/data/db.journal"
+BINARY_FILE="$PROJECT_DIR/data/db.bin"
+SQLITE_FILE="$PROJECT_DIR/data/db.sqlite3"
 BACKUP_DIR="$PROJECT_DIR/backups"
 KEEP_DAYS=30  # 保留最近 30 天的備份
 
+# 儲存引擎與 docker-compose 相同：環境變數優先，其次為專案目錄的 .env，預設 json
+if [ -z "$STORAGE_BACKEND" ] && [ -f "$PROJECT_DIR/.env" ]; then
+    STORAGE_BACKEND=$(sed -n 's/^STORAGE_BACKEND=//p' "$PROJECT_DIR/.env" | tail -n 1 | tr -d '"'"'"'\r')
+fi
+STORAGE_BACKEND="${STORAGE_BACKEND:-json}"
+
 # 建立備份目錄
 mkdir -p "$BACKUP_DIR"
 
-# 檢查資料檔案是否存在
-if [ ! -f "$DATA_FILE" ]; then
-    echo "[錯誤] 找不到資料檔案: $DATA_FILE"
-    exit 1
-fi
-
 # 建立備份檔名（含時間戳）
 TIMESTAMP=$(date +%Y%m%d_%H%M%S)
-BACKUP_FILE="$BACKUP_DIR/db_backup_$TIMESTAMP.json"
 
-# 執行備份
-cp "$DATA_FILE" "$BACKUP_FILE"
+# sqlite 模式：以 SQLite 的線上備份取得一致的備份（服務執行中也可使用，不可直接複製資料庫與 WAL 檔）
+if [ "$STORAGE_BACKEND" = "sqlite" ]; then
+    BACKUP_FILE="$BACKUP_DIR/db_backup_$TIMESTAMP.sqlite3"
+    if [ ! -f "$SQLITE_FILE" ]; then
+        echo "[錯誤] 找不到資料檔案: $SQLITE_FILE"
+        exit 1
+    fi
+    if command -v sqlite3 > /dev/null; then
+        sqlite3 "$SQLITE_FILE" ".backup '$BACKUP_FILE'"
+    elif command -v python3 > /dev/null; then
+        python3 -c 'import sqlite3, sys
+source, target = sqlite3.connect(sys.argv[1]), sqlite3.connect(sys.argv[2])
+source.backup(target)
+target.close()
+source.close()' "$SQLITE_FILE" "$BACKUP_FILE"
+    else
+        echo "[錯誤] 需要 sqlite3 或 python3 才能備份 SQLite 資料庫"
+        exit 1
+    fi
+else
+    # 二進位快照格式（SNAPSHOT_FORMAT=binary）的資料存於 db.bin
+    if [ -f "$BINARY_FILE" ] && { [ ! -f "$DATA_FILE" ] || [ "$BINARY_FILE" -nt "$DATA_FILE" ]; }; then
+        SNAPSHOT_FILE="$BINARY_FILE"
+        BACKUP_FILE="$BACKUP_DIR/db_backup_$TIMESTAMP.bin"
+    else
+        SNAPSHOT_FILE="$DATA_FILE"
+        BACKUP_FILE="$BACKUP_DIR/db_backup_$TIMESTAMP.json"
+    fi
+
+    # 檢查資料檔案是否存在
+    if [ ! -f "$SNAPSHOT_FILE" ]; then
+        echo "[錯誤] 找不到資料檔案: $SNAPSHOT_FILE"
+        exit 1
+    fi
+
+    # 執行備份；journal 模式下，尚未壓縮的異動在日誌檔中，一併備份
+    cp "$SNAPSHOT_FILE" "$BACKUP_FILE" && { [ ! -f "$JOURNAL_FILE" ] || cp "$JOURNAL_FILE" "$BACKUP_DIR/db_backup_$TIMESTAMP.journal"; }
+fi
 
 if [ $? -eq 0 ]; then
     echo "[成功] 備份完成: $BACKUP_FILE"
@@ -40,9 +78,12 @@ fi
 # 清理過期備份
 echo "[清理] 刪除 $KEEP_DAYS 天前的備份..."
 find "$BACKUP_DIR" -name "db_backup_*.json" -type f -mtime +$KEEP_DAYS -delete
+find "$BACKUP_DIR" -name "db_backup_*.journal" -type f -mtime +$KEEP_DAYS -delete
+find "$BACKUP_DIR" -name "db_backup_*.bin" -type f -mtime +$KEEP_DAYS -delete
+find "$BACKUP_DIR" -name "db_backup_*.sqlite3*" -type f -mtime +$KEEP_DAYS -delete
 
 # 顯示目前備份數量
-BACKUP_COUNT=$(ls -1 "$BACKUP_DIR"/db_backup_*.json 2>/dev/null | wc -l)
+BACKUP_COUNT=$(ls -1 "$BACKUP_DIR"/db_backup_*.json "$BACKUP_DIR"/db_backup_*.bin "$BACKUP_DIR"/db_backup_*.sqlite3 2>/dev/null | wc -l)
 echo "[資訊] 目前共有 $BACKUP_COUNT 個備份檔案"
 
 echo "[完成] 備份作業結束"
@@ -1393,10 +1393,18 @@ async function init() {
   } else {
     // 未登入，載入公開資料（使用不需認證的公開 API）
     try {
-      const publicRes = await fetch(`${API_URL}/api/public/leaderboard`).then(r => r.ok ? r.json() : { members: [], records: [] }).catch(() => ({ members: [], records: [] }));
-
+      // 公開排行榜的簽到記錄一律分頁，依 next_cursor 逐頁取回
+      const fetchPage = after => fetch(`${API_URL}/api/public/leaderboard?limit=1000${after ? `&after=${encodeURIComponent(after)}` : ''}`)
+        .then(r => r.ok ? r.json() : { members: [], records: [] })
+        .catch(() => ({ members: [], records: [] }));
+      let publicRes = await fetchPage(null);
+      const records = publicRes.records || [];
       state.members = publicRes.members || [];
-      state.checkInRecords = publicRes.records || [];
+      while (publicRes.next_cursor) {
+        publicRes = await fetchPage(publicRes.next_cursor);
+        records.push(...(publicRes.records || []));
+      }
+      state.checkInRecords = records;
       state.teams = [];
       state.events = [];
     } catch (err) {